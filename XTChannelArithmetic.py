@@ -159,6 +159,13 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
 
             sitk.OtsuThreshold([1], 0, 1)
 
+    #. Partition a specific channel into three classes using two thresholds computed
+       by the Otsu filter from a single histogram, resulting image has values in {0,1,2}:
+
+        .. code-block:: Python
+
+            sitk.OtsuMultipleThresholds([1], numberOfThresholds=2)
+
     #. Gaussian blurring (variance specified in metric units, e.g. nm):
 
         .. code-block:: Python
@@ -200,7 +207,7 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
 
         .. code-block:: Python
 
-            sitk.Cast([1]>100, sitk.sitkFloat32)*[1]
+            sitk.Mask([1], [1]>100)
 
     #. Threshold a specific channel retaining the values above the threshold and
        setting all values equal or lower to the threshold to an arbitrary value
@@ -208,7 +215,7 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
 
         .. code-block:: Python
 
-            sitk.Cast([1]>100, sitk.sitkFloat32)*[1] + sitk.Cast([1]<=100, sitk.sitkFloat32)*20
+            sitk.Mask([1], [1]>100, outsideValue=20)
 
     #. Threshold a specific channel, get all connected components, then
        sort the components according to size, discarding those smaller than a minimum
@@ -224,7 +231,7 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
 
         .. code-block:: Python
 
-            ([1]>20)*([2]>20)
+            ([1]>20) & ([2]>20)
 
     #. Create a binary mask representing the colocalization of two channels.
        We are interested in all pixels in channel 2 that have a value above 20
@@ -268,6 +275,10 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
         # number of cores in the CPU."
         self.threadpool = QThreadPool.globalInstance()
 
+        # (QLabel, QProgressBar) pairs displayed in the progress grid, reused
+        # across batches.
+        self._progress_pool = []
+
         # Configure the help dialog.
         self.help_dialog = HelpDialog(w=700, h=500)
         self.help_dialog.setWindowTitle("Channel Arithmetic Help")
@@ -394,18 +405,23 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
         self.slice_by_slice_checkbox.setChecked(False)
         self.new_channel_name_line_edit.clear()
 
-        # Remove all widgets from layout, done in reverse order because
-        # removing from the begining shifts the rest of the items
-        for i in reversed(range(self.progress_grid_layout.count())):
-            self.progress_grid_layout.itemAt(i).widget().setParent(None)
-
-        for i, file_name in enumerate(file_names):
-            self.progress_grid_layout.addWidget(
-                QLabel(os.path.basename(file_name)), i, 0
-            )
+        # Reuse the label and progress bar widgets from previous batches, only
+        # creating new ones when the batch is larger than any seen before.
+        for i in range(len(self._progress_pool), len(file_names)):
+            label = QLabel()
             progress_bar = QProgressBar()
             progress_bar.setMaximum(100)
+            self.progress_grid_layout.addWidget(label, i, 0)
             self.progress_grid_layout.addWidget(progress_bar, i, 1)
+            self._progress_pool.append((label, progress_bar))
+        for file_name, (label, progress_bar) in zip(file_names, self._progress_pool):
+            label.setText(os.path.basename(file_name))
+            progress_bar.setValue(0)
+            label.show()
+            progress_bar.show()
+        for label, progress_bar in self._progress_pool[len(file_names) :]:  # noqa: E203
+            label.hide()
+            progress_bar.hide()
 
         self.stack.setCurrentIndex(1)
 
@@ -445,6 +461,7 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
             "QFileDialog.getOpenFileNames()",
             "",
             "Imaris Images (*.ims);;All Files (*)",
+            options=ieb.file_dialog_options,
         )
         if file_names:
             self.input_files_edit.setText("\n".join(file_names))
@@ -502,7 +519,7 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
                     self._processing_error_function
                 )
                 arithmetic_calculator.signals.progress_signal.connect(
-                    self.progress_grid_layout.itemAtPosition(i, 1).widget().setValue
+                    self._progress_pool[i][1].setValue
                 )
                 arithmetic_calculator.signals.update_state_signal.connect(
                     self.status_bar.showMessage
@@ -530,8 +547,8 @@ class ChannelArithmeticDialog(ieb.ImarisExtensionBase):
         if self.num_threads_left == 0:
             QApplication.restoreOverrideCursor()
             self.status_bar.clearMessage()
-            for i in range(self.progress_grid_layout.rowCount()):
-                self.progress_grid_layout.itemAtPosition(i, 1).widget().setValue(0)
+            for _, progress_bar in self._progress_pool:
+                progress_bar.setValue(0)
             # Enable the UI interaction after computation
             self.arithmetic_expression_text_edit.setReadOnly(False)
             self.slice_by_slice_checkbox.setEnabled(True)
@@ -588,12 +605,7 @@ class ArithmeticCalculator(QRunnable):
     def process_vol_by_vol(self):
         meta_data = sio.read_metadata(self.input_file_name)
         message_fname = os.path.basename(self.input_file_name)
-        # Read a single pixel image to get the original pixel type
-        original_pixel_type = sio.read(
-            self.input_file_name,
-            channel_index=0,
-            sub_ranges=[range(0, 1), range(0, 1), range(0, 1)],
-        ).GetPixelID()
+        original_pixel_type = meta_data["sitk_pixel_type"]
 
         using_all_channels = False
         # Expression is applied to all channels.
@@ -616,55 +628,69 @@ class ArithmeticCalculator(QRunnable):
         channel_info["range"] = [0, 255]
         channel_info["alpha"] = self.new_channel_alpha
 
+        # Compile the expression once, the open file, time point and channel index
+        # are variables whose values are provided when the expression is evaluated.
+        # They are global variables of the evaluation so that they are also visible
+        # in nested scopes of the expression (lambda, generator expression).
+        # All channels referenced for a time point are read from a single open file,
+        # which is closed before the new channel is appended to it.
+        read_float32_command_str = (
+            "sitk.Cast(sio.read_from(reader, time_index=time_index, resolution_index=0, "
+            + "channel_index=\\1), sitk.sitkFloat32)"
+        )
+        read_float32_command_str_any_channel = (
+            "sitk.Cast(sio.read_from(reader, time_index=time_index, resolution_index=0, "
+            + "channel_index=channel_index), sitk.sitkFloat32)"
+        )
+        expression_code = compile(
+            self.channel_pattern.sub(
+                read_float32_command_str, self.arithmetic_expression
+            ).replace("[i]", read_float32_command_str_any_channel),
+            "<arithmetic expression>",
+            "eval",
+        )
+
         if using_all_channels:
             time_entries = len(meta_data["times"])
-            for i in range(len(meta_data["channels_information"])):
+            for i, original_channel_info in meta_data["channels_information"]:
+                # The new channel's meta data only depends on the original channel,
+                # so it is set once and not per time point.
+                channel_info = {
+                    "name": original_channel_info["name"] + "_modified",
+                    "description": channel_description + f", i={i}",
+                    "range": original_channel_info["range"],
+                    "alpha": original_channel_info["alpha"],
+                }
+                if "color" in original_channel_info:
+                    channel_info["color"] = original_channel_info["color"]
+                elif "color_table" in original_channel_info:
+                    channel_info["color_table"] = original_channel_info["color_table"]
+                channel_info_xml = sio.channels_information_list2xmlstr(
+                    [(0, channel_info)]
+                )
                 for time_index in range(time_entries):
                     self.signals.update_state_signal.emit(
                         f"Evaluating arithmetic expression ({message_fname})..."
                     )
-                    read_float32_command_str = (
-                        f'sitk.Cast(sio.read(file_name="{self.input_file_name}", time_index={time_index}, resolution_index=0, '  # noqa: E501
-                        + "channel_index=\\1), sitk.sitkFloat32)"
-                    )
-                    read_float32_command_str_any_channel = (
-                        f'sitk.Cast(sio.read(file_name="{self.input_file_name}", time_index={time_index}, resolution_index=0, '  # noqa: E501
-                        + f"channel_index={i}), sitk.sitkFloat32)"
-                    )
-                    new_channel = sitk.Clamp(
-                        eval(
-                            self.channel_pattern.sub(
-                                read_float32_command_str, self.arithmetic_expression
-                            ).replace("[i]", read_float32_command_str_any_channel)
-                        ),
-                        original_pixel_type,
-                    )
+                    with sio.open_reader(self.input_file_name) as reader:
+                        new_channel = sitk.Clamp(
+                            eval(
+                                expression_code,
+                                {
+                                    **globals(),
+                                    "reader": reader,
+                                    "time_index": time_index,
+                                    "channel_index": i,
+                                },
+                            ),
+                            original_pixel_type,
+                        )
                     self.signals.progress_signal.emit(
                         int(100 * (i * time_entries + time_index + 1) / total_work)
                     )
-                    channel_info["name"] = (
-                        meta_data["channels_information"][i][1]["name"] + "_modified"
-                    )
-                    channel_info["description"] = channel_description + f", i={i}"
-                    if "color" in meta_data["channels_information"][i][1]:
-                        channel_info["color"] = meta_data["channels_information"][i][1][
-                            "color"
-                        ]
-                    elif "color_table" in meta_data["channels_information"][i][1]:
-                        channel_info["color_table"] = meta_data["channels_information"][
-                            i
-                        ][1]["color_table"]
-                        if "color" in channel_info:
-                            del channel_info["color"]
-                    channel_info["range"] = meta_data["channels_information"][i][1][
-                        "range"
-                    ]
-                    channel_info["alpha"] = meta_data["channels_information"][i][1][
-                        "alpha"
-                    ]
                     new_channel.SetMetaData(
                         sio.channels_metadata_key,
-                        sio.channels_information_list2xmlstr([(0, channel_info)]),
+                        channel_info_xml,
                     )
                     self.signals.update_state_signal.emit(
                         f"Saving channel ({message_fname})..."
@@ -674,28 +700,29 @@ class ArithmeticCalculator(QRunnable):
                     )
         else:
             channel_info["description"] = channel_description
+            channel_info_xml = sio.channels_information_list2xmlstr([(0, channel_info)])
             for time_index in range(len(meta_data["times"])):
                 self.signals.update_state_signal.emit(
                     f"Evaluating arithmetic expression ({message_fname})..."
                 )
-                read_float32_command_str = (
-                    f'sitk.Cast(sio.read(file_name="{self.input_file_name}", time_index={time_index}, resolution_index=0, '  # noqa: E501
-                    + "channel_index=\\1), sitk.sitkFloat32)"
-                )
-                new_channel = sitk.Clamp(
-                    eval(
-                        self.channel_pattern.sub(
-                            read_float32_command_str, self.arithmetic_expression
-                        )
-                    ),
-                    original_pixel_type,
-                )
+                with sio.open_reader(self.input_file_name) as reader:
+                    new_channel = sitk.Clamp(
+                        eval(
+                            expression_code,
+                            {
+                                **globals(),
+                                "reader": reader,
+                                "time_index": time_index,
+                            },
+                        ),
+                        original_pixel_type,
+                    )
                 self.signals.progress_signal.emit(
                     int(100 * (time_index + 1) / total_work)
                 )
                 new_channel.SetMetaData(
                     sio.channels_metadata_key,
-                    sio.channels_information_list2xmlstr([(0, channel_info)]),
+                    channel_info_xml,
                 )
                 self.signals.update_state_signal.emit(
                     f"Saving channel ({message_fname})..."
@@ -707,12 +734,7 @@ class ArithmeticCalculator(QRunnable):
     def process_slice_by_slice(self):
         meta_data = sio.read_metadata(self.input_file_name)
         message_fname = os.path.basename(self.input_file_name)
-        # Read a single pixel image to get the original pixel type
-        original_pixel_type = sio.read(
-            self.input_file_name,
-            channel_index=0,
-            sub_ranges=[range(0, 1), range(0, 1), range(0, 1)],
-        ).GetPixelID()
+        original_pixel_type = meta_data["sitk_pixel_type"]
 
         using_all_channels = False
         # Expression is applied to all channels.
@@ -738,75 +760,91 @@ class ArithmeticCalculator(QRunnable):
         channel_info["range"] = [0, 255]
         channel_info["alpha"] = self.new_channel_alpha
 
+        # Compile the expression once, the open file, time point, channel index and
+        # slice sub ranges are variables whose values are provided when the expression
+        # is evaluated, as global variables so that they are also visible in nested
+        # scopes of the expression. All slices referenced for a time point are read
+        # from a single open file, which is closed before the new channel is appended
+        # to it.
+        read_float32_command_str = (
+            "sitk.Cast(sio.read_from(reader, time_index=time_index, resolution_index=0, "
+            + "channel_index=\\1, sub_ranges=sub_ranges)[:, :, 0], sitk.sitkFloat32)"
+        )
+        read_float32_command_str_any_channel = (
+            "sitk.Cast(sio.read_from(reader, time_index=time_index, resolution_index=0, "
+            + "channel_index=channel_index, sub_ranges=sub_ranges)[:, :, 0], sitk.sitkFloat32)"
+        )
+        expression_code = compile(
+            self.channel_pattern.sub(
+                read_float32_command_str, self.arithmetic_expression
+            ).replace("[i]", read_float32_command_str_any_channel),
+            "<arithmetic expression>",
+            "eval",
+        )
+
         if using_all_channels:
             time_entries = len(meta_data["times"])
             slice_entries = img_size[2]
-            for i in range(len(meta_data["channels_information"])):
+            for i, original_channel_info in meta_data["channels_information"]:
+                # The new channel's meta data only depends on the original channel,
+                # so it is set once and not per time point.
+                channel_info = {
+                    "name": original_channel_info["name"] + "_modified",
+                    "description": channel_description + f", i={i}",
+                    "range": original_channel_info["range"],
+                    "alpha": original_channel_info["alpha"],
+                }
+                if "color" in original_channel_info:
+                    channel_info["color"] = original_channel_info["color"]
+                elif "color_table" in original_channel_info:
+                    channel_info["color_table"] = original_channel_info["color_table"]
+                channel_info_xml = sio.channels_information_list2xmlstr(
+                    [(0, channel_info)]
+                )
                 for time_index in range(time_entries):
                     self.signals.update_state_signal.emit(
                         f"Evaluating arithmetic expression ({message_fname})..."
                     )
                     z_slices = []
-                    for z_index in range(slice_entries):
-                        read_float32_command_str = (
-                            f'sitk.Cast(sio.read(file_name="{self.input_file_name}", time_index={time_index}, resolution_index=0, '  # noqa: E501
-                            + f"channel_index=\\1, sub_ranges=[range(0,{img_size[0]}), range(0,{img_size[1]}), range({z_index},{z_index+1})])[:,:,0], sitk.sitkFloat32)"  # noqa: E501
-                        )
-                        read_float32_command_str_any_channel = (
-                            f'sitk.Cast(sio.read(file_name="{self.input_file_name}", time_index={time_index}, resolution_index=0, '  # noqa: E501
-                            + f"channel_index={i}, sub_ranges=[range(0,{img_size[0]}), range(0,{img_size[1]}), range({z_index},{z_index+1})])[:,:,0], sitk.sitkFloat32)"  # noqa: E501
-                        )
-                        z_slices.append(
-                            sitk.Clamp(
-                                eval(
-                                    self.channel_pattern.sub(
-                                        read_float32_command_str,
-                                        self.arithmetic_expression,
-                                    ).replace(
-                                        "[i]", read_float32_command_str_any_channel
-                                    )
-                                ),
-                                original_pixel_type,
+                    with sio.open_reader(self.input_file_name) as reader:
+                        for z_index in range(slice_entries):
+                            z_slices.append(
+                                sitk.Clamp(
+                                    eval(
+                                        expression_code,
+                                        {
+                                            **globals(),
+                                            "reader": reader,
+                                            "time_index": time_index,
+                                            "channel_index": i,
+                                            "sub_ranges": [
+                                                range(0, img_size[0]),
+                                                range(0, img_size[1]),
+                                                range(z_index, z_index + 1),
+                                            ],
+                                        },
+                                    ),
+                                    original_pixel_type,
+                                )
                             )
-                        )
-                        self.signals.progress_signal.emit(
-                            int(
-                                100
-                                * (
-                                    i * time_entries * slice_entries
-                                    + time_index * slice_entries
-                                    + z_index
-                                    + 1
+                            self.signals.progress_signal.emit(
+                                int(
+                                    100
+                                    * (
+                                        i * time_entries * slice_entries
+                                        + time_index * slice_entries
+                                        + z_index
+                                        + 1
+                                    )
+                                    / total_work
                                 )
-                                / total_work
                             )
-                        )
                     new_channel = sitk.JoinSeries(z_slices)
                     new_channel.SetOrigin(meta_data["origin"])
                     new_channel.SetSpacing(meta_data["spacings"][0])
-                    channel_info["name"] = (
-                        meta_data["channels_information"][i][1]["name"] + "_modified"
-                    )
-                    channel_info["description"] = channel_description + f", i={i}"
-                    if "color" in meta_data["channels_information"][i][1]:
-                        channel_info["color"] = meta_data["channels_information"][i][1][
-                            "color"
-                        ]
-                    elif "color_table" in meta_data["channels_information"][i][1]:
-                        channel_info["color_table"] = meta_data["channels_information"][
-                            i
-                        ][1]["color_table"]
-                        if "color" in channel_info:
-                            del channel_info["color"]
-                    channel_info["range"] = meta_data["channels_information"][i][1][
-                        "range"
-                    ]
-                    channel_info["alpha"] = meta_data["channels_information"][i][1][
-                        "alpha"
-                    ]
                     new_channel.SetMetaData(
                         sio.channels_metadata_key,
-                        sio.channels_information_list2xmlstr([(0, channel_info)]),
+                        channel_info_xml,
                     )
                     self.signals.update_state_signal.emit(
                         f"Saving channel ({message_fname})..."
@@ -816,35 +854,44 @@ class ArithmeticCalculator(QRunnable):
                     )
         else:
             channel_info["description"] = channel_description
+            channel_info_xml = sio.channels_information_list2xmlstr([(0, channel_info)])
             for time_index in range(len(meta_data["times"])):
                 self.signals.update_state_signal.emit(
                     f"Evaluating arithmetic expression ({message_fname})..."
                 )
                 z_slices = []
-                for z_index in range(img_size[2]):
-                    read_float32_command_str = (
-                        f'sitk.Cast(sio.read(file_name="{self.input_file_name}", time_index={time_index}, resolution_index=0, '  # noqa: E501
-                        + f"channel_index=\\1, sub_ranges=[range(0,{img_size[0]}), range(0,{img_size[1]}), range({z_index},{z_index+1})])[:,:,0], sitk.sitkFloat32)"  # noqa: E501
-                    )
-                    z_slices.append(
-                        sitk.Clamp(
-                            eval(
-                                self.channel_pattern.sub(
-                                    read_float32_command_str, self.arithmetic_expression
-                                )
-                            ),
-                            original_pixel_type,
+                with sio.open_reader(self.input_file_name) as reader:
+                    for z_index in range(img_size[2]):
+                        z_slices.append(
+                            sitk.Clamp(
+                                eval(
+                                    expression_code,
+                                    {
+                                        **globals(),
+                                        "reader": reader,
+                                        "time_index": time_index,
+                                        "sub_ranges": [
+                                            range(0, img_size[0]),
+                                            range(0, img_size[1]),
+                                            range(z_index, z_index + 1),
+                                        ],
+                                    },
+                                ),
+                                original_pixel_type,
+                            )
+                        )
+                        self.signals.progress_signal.emit(
+                            int(
+                                (100 * time_index * img_size[2] + z_index + 1)
+                                / total_work
+                            )
                         )
-                    )
-                    self.signals.progress_signal.emit(
-                        int((100 * time_index * img_size[2] + z_index + 1) / total_work)
-                    )
                 new_channel = sitk.JoinSeries(z_slices)
                 new_channel.SetOrigin(meta_data["origin"])
                 new_channel.SetSpacing(meta_data["spacings"][0])
                 new_channel.SetMetaData(
                     sio.channels_metadata_key,
-                    sio.channels_information_list2xmlstr([(0, channel_info)]),
+                    channel_info_xml,
                 )
                 self.signals.update_state_signal.emit(
                     f"Saving channel ({message_fname})..."
@@ -27,9 +27,7 @@
 #      </Menu>
 #    </CustomTools>
 
-from functools import partial
 import numpy as np
-import copy
 import pandas as pd
 import inspect
 import os
@@ -42,7 +40,7 @@ from PySide6.QtWidgets import (
     QApplication,
     QFileDialog,
     QCheckBox,
-    QTextEdit,
+    QPlainTextEdit,
     QLineEdit,
     QLabel,
     QPushButton,
@@ -56,6 +54,173 @@ from PySide6.QtCore import Qt
 import qdarkstyle
 
 
+def str_2_colors(input_str, original_file_path, zero_one=False):
+    """
+    Convert a string to list of numbers. The string represents a triplet
+    of numbers (color) or a file name containing triplets of numbers (color map).
+    """
+    try:
+        res = np.array(input_str.replace(",", " ").split(), dtype=np.float64)
+        if res.size != 3:
+            return []
+    except Exception:
+        try:
+            with open(os.path.join(original_file_path, input_str), "r") as fp:
+                res = np.array(fp.read().split(), dtype=np.float64)
+                if res.size % 3 != 0:
+                    return []
+        except Exception:
+            return []
+    if not ((res >= 0.0) & (res <= 255.0)).all():
+        return []
+    if zero_one:
+        res = res / 255.0
+    return res.tolist()
+
+
+def parse_color_column(color_column, original_file_path):
+    """
+    Convert the csv color column to a list of colors, r,g,b triplets or color
+    tables, with values in [0,1]. Rows with invalid entries are empty lists.
+    """
+    number_of_rows = len(color_column)
+    color_strs = color_column.astype(str).str.replace(",", " ", regex=False)
+    # Fast path, all rows are r,g,b triplets. The whole column is parsed by a
+    # single np.array call. A token that isn't a number raises, in which case
+    # we use the general path.
+    if (
+        not color_strs.str.contains(r"[^0-9eE+\-.\s]").any()
+        and (color_strs.str.count(r"\S+") == 3).all()
+    ):
+        try:
+            colors = np.array(" ".join(color_strs).split(), dtype=float)
+        except ValueError:
+            colors = np.empty(0)
+        if colors.size == 3 * number_of_rows:
+            colors = colors.reshape(-1, 3)
+            colors_valid = ((colors >= 0.0) & (colors <= 255.0)).all(axis=1)
+            return [
+                c if valid else []
+                for c, valid in zip((colors / 255.0).tolist(), colors_valid)
+            ]
+
+    # General path, colors are usually r,g,b triplets, these are parsed for all
+    # rows in a single vectorized pass. Only rows that contain a non-numeric
+    # entry are treated as color table file names.
+    color_parts = color_strs.str.split(expand=True)
+    color_values = color_parts.apply(pd.to_numeric, errors="coerce")
+    all_numeric = (color_values.notna() | color_parts.isna()).all(axis=1)
+    is_triplet = all_numeric & (color_parts.notna().sum(axis=1) == 3)
+    color_list = [[]] * number_of_rows
+    triplet_rows = is_triplet.to_numpy().nonzero()[0]
+    if triplet_rows.size > 0:
+        colors = color_values.iloc[triplet_rows, 0:3].to_numpy(dtype=float)
+        colors_valid = ((colors >= 0.0) & (colors <= 255.0)).all(axis=1)
+        colors = colors / 255.0
+        for i, c, valid in zip(triplet_rows, colors.tolist(), colors_valid):
+            if valid:
+                color_list[i] = c
+    # The same color table file is often used for several channels, read
+    # each file only once.
+    color_tables = {}
+    for i in (~all_numeric).to_numpy().nonzero()[0]:
+        color_str = color_column.iat[i]
+        if color_str not in color_tables:
+            color_tables[color_str] = str_2_colors(
+                color_str,
+                original_file_path=original_file_path,
+                zero_one=True,
+            )
+        color_list[i] = color_tables[color_str]
+    return color_list
+
+
+def read_csv_settings(file_name):
+    """
+    Read channel settings from a csv file. Returns a list of tuples, (channel index,
+    dictionary with the channel settings), in the format used by
+    sio.read_channels_information. Raises an exception if the file contents are
+    invalid.
+    """
+    # Parsed values are kept per column, each list aligned with the csv rows.
+    columns = {}
+    color_table_rows = set()
+    df = pd.read_csv(
+        file_name,
+        header=0,
+        index_col=False,
+        dtype=str,
+        engine="c",
+        na_filter=False,
+        keep_default_na=False,
+    )
+    # validate the data, find rows with missing values in the columns we use
+    # ensure that:
+    #   color information is correct:three floats in [0,255]
+    #   range information is correct:two floats in [0,255]
+    used_columns = [
+        c
+        for c in df.columns
+        if c in {"name", "description", "color", "alpha", "range", "gamma"}
+    ]
+    invalid_row_numbers = (df[used_columns] == "").any(axis=1).to_numpy().nonzero()[0]
+    if invalid_row_numbers.size > 0:
+        raise Exception(
+            "Missing values in row(s): " + ",".join(map(str, invalid_row_numbers))
+        )
+
+    if "color" in df.columns:
+        color_list = parse_color_column(
+            df["color"], original_file_path=os.path.dirname(file_name)
+        )
+        invalid_row_numbers = [i for i, c in enumerate(color_list) if len(c) == 0]
+        if len(invalid_row_numbers) > 0:
+            raise Exception(
+                "Error in expected color setting [R,G,B] file ({0}) row(s): ".format(
+                    os.path.basename(file_name)
+                )
+                + ",".join(map(str, invalid_row_numbers))
+            )
+        else:
+            columns["color"] = color_list
+            color_table_rows = {i for i, c in enumerate(color_list) if len(c) > 3}
+    if "name" in df.columns:
+        columns["name"] = df["name"].tolist()
+    if "description" in df.columns:
+        columns["description"] = df["description"].tolist()
+    if "range" in df.columns:
+        range_parts = (
+            df["range"]
+            .astype(str)
+            .str.replace(",", " ", regex=False)
+            .str.split(expand=True)
+        )
+        range_counts = range_parts.notna().sum(axis=1).tolist()
+        range_values = (
+            range_parts.apply(pd.to_numeric, errors="raise")
+            .to_numpy(dtype=float)
+            .tolist()
+        )
+        columns["range"] = [r[0:n] for r, n in zip(range_values, range_counts)]
+    if "gamma" in df.columns:
+        columns["gamma"] = df["gamma"].astype(float).tolist()
+    if "alpha" in df.columns:
+        columns["alpha"] = df["alpha"].astype(float).tolist()
+    if not columns:
+        raise Exception(
+            'File ({0}) does not contain any column with one of the expected headings ("name", "description", "color", "alpha", "range", "gamma").'.format(  # noqa E501
+                os.path.basename(file_name)
+            )
+        )
+    else:
+        keys = list(columns.keys())
+        color_table_keys = ["color_table" if k == "color" else k for k in keys]
+        return [
+            (i, dict(zip(color_table_keys if i in color_table_rows else keys, row)))
+            for i, row in enumerate(zip(*columns.values()))
+        ]
+
+
 def XTBatchConfigureChannelSettings(imaris_id=None):
 
     app = QApplication([])
@@ -140,6 +305,9 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
             inspect.getdoc(self), pygments_css_file_name="pygments_dark.css"
         )
 
+        # List of input files, the text edit is only used for display.
+        self._input_files = []
+
         self.__create_gui()
         self.setWindowTitle("Apply Preset Channel Names and Display Settings")
         self.show()
@@ -216,6 +384,7 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
             "QFileDialog.getOpenFileName()",
             "",
             "Comma Separated Value (*.csv);;Imaris (*.ims);;All Files (*)",
+            options=ieb.file_dialog_options,
         )
         if file_name:
             self.config_file_line_edit.setText(file_name)
@@ -244,16 +413,21 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
     def __validate_and_configure_apply_widget(self, file_name):
         self.channel_settings = []
 
+        # Identify imaris files using the HDF5 signature so that large binary
+        # files are not parsed as csv.
         try:
-            self.__load_csv_settings(file_name)
-        except Exception:
-            try:
+            with open(file_name, "rb") as fp:
+                is_hdf5 = fp.read(8) == b"\x89HDF\r\n\x1a\n"
+            if is_hdf5:
                 self.__load_ims_settings(file_name)
-            except Exception:
-                self.__error_function(
-                    "Failed reading file ({0}).<br>".format(file_name)
-                )
-                return
+            else:
+                self.channel_settings = read_csv_settings(file_name)
+        except Exception as e:
+            self.channel_settings = []
+            self.__error_function(
+                "Failed reading file ({0}).<br>{1}".format(file_name, e)
+            )
+            return
 
         # Create or update the apply layout (first time through the wizard or
         # the user went back and updated the configuration file selection).
@@ -293,82 +467,8 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
         self.apply_layout.addLayout(self.prev_layout)
         self.stack.setCurrentIndex(1)
 
-    def __load_csv_settings(self, file_name):
-        data = []
-        df = pd.read_csv(file_name, header=0, index_col=False, dtype=str)
-        # validate the data, find rows with missing values
-        # ensure that:
-        #   color information is correct:three floats in [0,255]
-        #   range information is correct:two floats in [0,255]
-        invalid_row_numbers, _ = np.where(df.isna())
-        if invalid_row_numbers.size > 0:
-            raise Exception(
-                "Missing values in row(s): " + ",".join(map(str, invalid_row_numbers))
-            )
-
-        number_of_rows = len(df.index)
-        if "color" in df.columns:
-            color_list = list(
-                df["color"].apply(
-                    partial(
-                        self.__str_2_colors,
-                        original_file_path=os.path.dirname(file_name),
-                        zero_one=True,
-                    )
-                )
-            )
-            invalid_row_numbers = [i for i, c in enumerate(color_list) if len(c) == 0]
-            if len(invalid_row_numbers) > 0:
-                raise Exception(
-                    "Error in expected color setting [R,G,B] file ({0}) row(s): ".format(
-                        os.path.basename(file_name)
-                    )
-                    + ",".join(map(str, invalid_row_numbers))
-                )
-            else:
-                data.append(
-                    [
-                        ["color_table", c] if len(c) > 3 else ["color", c]
-                        for c in color_list
-                    ]
-                )
-        if "name" in df.columns:
-            data.append(list(zip(["name"] * number_of_rows, list(df["name"]))))
-        if "description" in df.columns:
-            data.append(
-                list(zip(["description"] * number_of_rows, list(df["description"])))
-            )
-        if "range" in df.columns:
-            range_list = [
-                [float(c) for c in r.replace(",", " ").split()]
-                for r in list(df["range"])
-            ]
-            data.append(list(zip(["range"] * number_of_rows, range_list)))
-        if "gamma" in df.columns:
-            data.append(
-                list(zip(["gamma"] * number_of_rows, list(df["gamma"].astype(float))))
-            )
-        if "alpha" in df.columns:
-            data.append(
-                list(zip(["alpha"] * number_of_rows, list(df["alpha"].astype(float))))
-            )
-        if not data:
-            raise Exception(
-                'File ({0}) does not contain any column with one of the expected headings ("name", "description", "color", "alpha", "range", "gamma").'.format(  # noqa E501
-                    os.path.basename(file_name)
-                )
-            )
-        else:
-            number_of_columns = len(data)
-            for i in range(number_of_rows):
-                new_channel_info = {}
-                for j in range(number_of_columns):
-                    new_channel_info[data[j][i][0]] = data[j][i][1]
-                self.channel_settings.append((i, new_channel_info))
-
     def __load_ims_settings(self, file_name):
-        metadata_dict = sio.read_metadata(file_name)
-        self.channel_settings = copy.deepcopy(metadata_dict["channels_information"])
+        self.channel_settings = sio.read_channels_information(file_name)
 
     def __set_channel_information_callback(self):
         """
@@ -377,23 +477,34 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
         """
         problematic_images = []
 
-        channel_settings = copy.deepcopy(self.channel_settings)
         # Only use the subset of the settings the user selected.
-        del_keys = []
+        del_keys = set()
         for cb in self.settings_checkboxes:
             if not cb.isChecked():
-                del_keys.extend(self.checkbox_titles_2_keys[cb.text()])
-
-        for cs in channel_settings:
-            for del_key in del_keys:
-                try:
-                    del cs[1][del_key]
-                except KeyError:
-                    pass
-
-        for file_name in self.input_files_edit.toPlainText().split("\n"):
-            input_metadata = sio.read_metadata(file_name)
-            input_len = len(input_metadata["channels_information"])
+                del_keys.update(self.checkbox_titles_2_keys[cb.text()])
+        # The filtered settings are built once and shared by all files. List
+        # values (color, color table, range) are converted to tuples so that
+        # they cannot be modified while shared.
+        channel_settings = [
+            (
+                i,
+                {
+                    k: tuple(v) if isinstance(v, list) else v
+                    for k, v in cs.items()
+                    if k not in del_keys
+                },
+            )
+            for i, cs in self.channel_settings
+        ]
+        # Nothing to write if the user deselected all of the settings.
+        if all(not cs for _, cs in channel_settings):
+            QMessageBox().information(
+                self, "Message", "No channel settings selected, files not modified."
+            )
+            return
+
+        for file_name in self._input_files:
+            input_len = sio.read_number_of_channels(file_name)
             if input_len > len(self.channel_settings):
                 problematic_images.append(file_name)
             n = (
@@ -417,31 +528,6 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
                 self, "Message", "Successfully Completed Batch Processing."
             )
 
-    def __str_2_colors(self, input_str, original_file_path, zero_one=False):
-        """
-        Convert a string to list of numbers. The string represents a triplet
-        of numbers (color) or a file name containing triplets of numbers (color map).
-        """
-        try:
-            res = [float(c) for c in input_str.replace(",", " ").split()]
-            if len(res) != 3:
-                return []
-        except Exception:
-            try:
-                with open(os.path.join(original_file_path, input_str), "r") as fp:
-                    color_table_str = fp.read()
-                    res = [float(c) for c in color_table_str.split()]
-                    if len(res) % 3 != 0:
-                        return []
-            except Exception:
-                return []
-        for val in res:
-            if not 0.0 <= val <= 255.0:
-                return []
-        if zero_one:
-            res = [v / 255.0 for v in res]
-        return res
-
     def __create_select_input_widget(self):
         wid = QWidget()
         input_layout = QVBoxLayout()
@@ -456,7 +542,7 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
         layout.addWidget(button)
         input_layout.addLayout(layout)
 
-        self.input_files_edit = QTextEdit()
+        self.input_files_edit = QPlainTextEdit()
         self.input_files_edit.setReadOnly(True)
         input_layout.addWidget(self.input_files_edit)
 
@@ -481,9 +567,11 @@ class ConfigureChannelSettingsDialog(ieb.ImarisExtensionBase):
             "QFileDialog.getOpenFileNames()",
             "",
             "Imaris Images (*.ims);;All Files (*)",
+            options=ieb.file_dialog_options,
         )
         if file_names:
-            self.input_files_edit.setText("\n".join(file_names))
+            self._input_files = [f for f in file_names if f]
+            self.input_files_edit.setPlainText("\n".join(self._input_files))
             self.input_files_next_button.setEnabled(True)
 
 
@@ -28,6 +28,7 @@
 #    </CustomTools>
 
 
+import numpy as np
 import pandas as pd
 import sitk_ims_file_io as sio
 import inspect
@@ -50,6 +51,57 @@ from PySide6.QtCore import Qt
 import qdarkstyle
 
 
+def export_channel_settings(input_file_name, output_file_name):
+    """
+    Export the channel settings of the given Imaris file to a csv file. Channels
+    with a color table have their table saved in a separate file next to the csv
+    file.
+    """
+    metadata = sio.read_metadata(input_file_name)
+    # Using known metadata dictionary structure from the sitk_ims_file_io module.
+    # The settings are collected per column. Gamma is optional, the column is
+    # dropped if no channel has it, otherwise channels without it get the default
+    # gamma, 1.0, so that the file can be imported.
+    channel_settings = {
+        "name": [],
+        "description": [],
+        "color": [],
+        "alpha": [],
+        "range": [],
+        "gamma": [],
+    }
+    for i, cs in metadata["channels_information"]:
+        if "color" in cs:
+            color_settings = ", ".join(
+                map(str, (np.asarray(cs["color"], dtype=np.float64) * 255).tolist())
+            )
+        elif "color_table" in cs:
+            color_settings = (
+                os.path.splitext(output_file_name)[0] + f"_color_table_channel{i}.pal"
+            )
+            color_table = np.asarray(cs["color_table"], dtype=np.float64) * 255
+            np.savetxt(
+                color_settings,
+                color_table.reshape(-1, 3),
+                fmt="%.3f",
+                delimiter=" ",
+            )
+        channel_settings["name"].append(cs["name"])
+        channel_settings["description"].append(cs["description"])
+        channel_settings["color"].append(os.path.basename(color_settings))
+        channel_settings["alpha"].append(cs["alpha"])
+        channel_settings["range"].append(", ".join(map(str, cs["range"])))
+        channel_settings["gamma"].append(cs.get("gamma"))
+    if all(gamma is None for gamma in channel_settings["gamma"]):
+        del channel_settings["gamma"]
+    else:
+        channel_settings["gamma"] = [
+            1.0 if gamma is None else gamma for gamma in channel_settings["gamma"]
+        ]
+    df = pd.DataFrame(channel_settings)
+    df.to_csv(output_file_name, index=False)
+
+
 def XTExportChannelSettings(imaris_id=None):
     app = QApplication([])
     app.setStyle(ieb.style)  # Consistent setting of style for all applications
@@ -165,7 +217,11 @@ class ExportChannelSettingsDialog(ieb.ImarisExtensionBase):
 
     def __browse_callback(self):
         file_name, _ = QFileDialog.getOpenFileName(
-            self, "QFileDialog.getOpenFileName()", "", "Imaris (*.ims);;All Files (*)"
+            self,
+            "QFileDialog.getOpenFileName()",
+            "",
+            "Imaris (*.ims);;All Files (*)",
+            options=ieb.file_dialog_options,
         )
         self.input_file_line_edit.setText(file_name)
 
@@ -175,53 +231,13 @@ class ExportChannelSettingsDialog(ieb.ImarisExtensionBase):
             os.path.dirname(input_file_name), "channel_settings"
         )
         output_file_name, _ = QFileDialog.getSaveFileName(
-            self, "Export Channel Settings", default_output_file_name, "csv(*.csv)"
-        )
-        metadata = sio.read_metadata(input_file_name)
-        # Using known metadata dictionary structure from the sitk_ims_file_io module
-        channel_settings_headings = [
-            "name",
-            "description",
-            "color",
-            "alpha",
-            "range",
-            "gamma",
-        ]
-        channel_settings = [None] * len(metadata["channels_information"])
-        for i, cs in metadata["channels_information"]:
-            current_settings = [cs["name"], cs["description"]]
-            if "color" in cs:
-                color_settings = ", ".join([str(c * 255) for c in cs["color"]])
-            elif "color_table" in cs:
-                color_table = "".join(
-                    [
-                        f"{c*255:.3f}\n" if (i % 3) == 0 else f"{c*255:.3f} "
-                        for i, c in enumerate(cs["color_table"], 1)
-                    ]
-                )
-                color_settings = (
-                    os.path.splitext(output_file_name)[0]
-                    + f"_color_table_channel{i}.pal"
-                )
-                with open(color_settings, "w") as fp:
-                    fp.write(color_table)
-            current_settings.extend(
-                [
-                    os.path.basename(color_settings),
-                    cs["alpha"],
-                    ", ".join([str(v) for v in cs["range"]]),
-                ]
-            )
-            if "gamma" in cs:
-                current_settings.append(cs["gamma"])
-            channel_settings[i] = current_settings
-        df = pd.DataFrame(
-            channel_settings,
-            columns=channel_settings_headings[
-                0 : len(channel_settings[0])  # noqa: E203
-            ],
+            self,
+            "Export Channel Settings",
+            default_output_file_name,
+            "csv(*.csv)",
+            options=ieb.file_dialog_options,
         )
-        df.to_csv(output_file_name, index=False)
+        export_channel_settings(input_file_name, output_file_name)
         QMessageBox().information(self, "Message", "Succesfuly Exported")
 
 
@@ -31,6 +31,11 @@
 #    </CustomTools>
 
 import os
+import concurrent.futures
+import contextlib
+import functools
+import itertools
+import mmap
 import numpy as np
 import json
 import hashlib
@@ -69,12 +74,122 @@ import imaris_extension_base as ieb
 matplotlib.use("Agg")
 
 
-def file_md5(file_name):
-    md5 = hashlib.md5()
-    with open(file_name, "rb") as fp:
-        for mem_block in iter(lambda: fp.read(128 * md5.block_size), b""):
-            md5.update(mem_block)
-    return md5.hexdigest()
+def file_hash(file_name, hash_name="blake2b"):
+    """
+    Compute the hex digest of the file contents using the given hashlib algorithm.
+    The default, blake2b, is faster than md5 on 64 bit platforms. md5 is only used
+    to validate configuration files written by earlier versions.
+    """
+    with open(file_name, "rb", buffering=0) as fp:
+        # Hash the memory mapped file, avoids copying the contents into user space
+        # buffers. Empty files and some network file systems cannot be memory
+        # mapped, these are read.
+        try:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.new(hash_name, mm).hexdigest()
+        except (OSError, ValueError):
+            pass
+        # hashlib.file_digest is only available in Python 3.11 and later.
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(fp, hash_name).hexdigest()
+        file_hasher = hashlib.new(hash_name)
+        buffer = bytearray(1 << 20)
+        buffer_view = memoryview(buffer)
+        while True:
+            n = fp.readinto(buffer)
+            if not n:
+                break
+            file_hasher.update(buffer_view[:n])
+    return file_hasher.hexdigest()
+
+
+@functools.lru_cache(maxsize=32)
+def _read_metadata(file_name, mtime_ns, file_size):
+    return sio.read_metadata(file_name)
+
+
+def read_metadata(file_name):
+    """
+    Read the metadata of the Imaris file, results are cached so that the same file
+    is only parsed once across the registration steps. The cache key includes the
+    file's modification time and size, so a modified file is read again. The
+    returned dictionary is shared, it should not be modified.
+    """
+    file_stat = os.stat(file_name)
+    return _read_metadata(file_name, file_stat.st_mtime_ns, file_stat.st_size)
+
+
+def correlation_matrix(images, block_bytes=32 * 1048576, max_samples=None):
+    """
+    Compute the Pearson correlation coefficient matrix of the given images, all
+    with the same size. The result is equivalent to np.corrcoef on the flattened
+    images, but it is computed in blocks of pixels using a buffer of at most
+    block_bytes, so the images are never copied into a single
+    (number of images x number of pixels) array.
+    If max_samples is given and the images have more pixels, the correlation is
+    estimated from max_samples pixels at the same random (fixed seed) locations in
+    all images.
+    """
+    arrs = [sitk.GetArrayViewFromImage(img).reshape(-1) for img in images]
+    num_pixels = arrs[0].size
+    if max_samples is not None and num_pixels > max_samples:
+        # Sampling with replacement, unlike choice without replacement, does not
+        # allocate a permutation of all the pixel indexes. Sorted indexes improve
+        # memory locality.
+        sample_indexes = np.sort(
+            np.random.default_rng(0).integers(0, num_pixels, max_samples)
+        )
+        return np.clip(np.corrcoef([arr[sample_indexes] for arr in arrs]), -1, 1)
+    # Two passes, first compute the means and then accumulate the cross products
+    # of the centered intensities (numerically more stable than accumulating raw
+    # moments). The centered blocks are float32, halving the memory traffic, the
+    # per block products are accumulated in float64.
+    means = np.array([arr.mean(dtype=np.float64) for arr in arrs])
+    cross_products = np.zeros((len(arrs), len(arrs)))
+    block_pixels = min(num_pixels, max(1, block_bytes // (4 * len(arrs))))
+    block = np.empty((len(arrs), block_pixels), dtype=np.float32)
+    for start in range(0, num_pixels, block_pixels):
+        n = min(block_pixels, num_pixels - start)
+        for i, arr in enumerate(arrs):
+            block[i, :n] = arr[start : start + n]  # noqa: E203
+            block[i, :n] -= np.float32(means[i])
+        cross_products += block[:, :n] @ block[:, :n].T
+    stds = np.sqrt(np.diag(cross_products))
+    return np.clip(cross_products / np.outer(stds, stds), -1, 1)
+
+
+def align_to_resample_grid(image, resample_size, resample_origin, resample_spacing):
+    """
+    Move the image so that its first pixel is at the resample origin and sample
+    it on the resample grid. When the image has the resample spacing, the
+    grid points coincide with the image's pixels and this is just a crop or zero
+    padding of the image, so no interpolation is performed. If the image already
+    has the resample size it is returned, with its origin and spacing modified
+    in place.
+    """
+    if np.allclose(image.GetSpacing(), resample_spacing) and np.allclose(
+        image.GetDirection(), np.eye(image.GetDimension()).ravel()
+    ):
+        image_size = image.GetSize()
+        crop_size = [max(0, n - m) for n, m in zip(image_size, resample_size)]
+        if any(crop_size):
+            image = sitk.Crop(image, [0] * len(crop_size), crop_size)
+        pad_size = [max(0, m - n) for n, m in zip(image_size, resample_size)]
+        if any(pad_size):
+            image = sitk.ConstantPad(image, [0] * len(pad_size), pad_size, 0)
+        image.SetOrigin(resample_origin)
+        image.SetSpacing(resample_spacing)
+        return image
+    return sitk.Resample(
+        image,
+        resample_size,
+        sitk.TranslationTransform(
+            3, [io - ro for io, ro in zip(image.GetOrigin(), resample_origin)]
+        ),
+        sitk.sitkLinear,
+        resample_origin,
+        resample_spacing,
+    )
 
 
 def XTRegisterSameChannel(imaris_id=None):
@@ -142,9 +257,18 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
            program to address the issue).
         3. A json file specifying the program settings used for registration (useful for
            reproducing the registration).
-        4. Optional pdf files showing the correlation between channels before and after
+        4. Transform files, one per input image in the input order (output file name
+           without extension followed by _0.tfm, _1.tfm...), mapping points from the
+           fixed image to the input image. These are exported for use by external
+           tools, e.g. SimpleITK's ReadTransform, the program itself does not read them
+           when loading settings.
+        5. Optional pdf files showing the correlation between channels before and after
            registration. This is useful for quantitatively evaluating the registration.
 
+    **Note:** The log, json, transform and pdf files are written in the same directory
+    as the output Imaris file, with names derived from it. Existing files with these
+    names are overwritten without warning.
+
     Program Settings
     ----------------
 
@@ -241,6 +365,9 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
         super(RegisterSameChannelDialog, self).__init__()
         self.register_images = RegisterImages()
         self.resample_images = ResampleImages()
+        self.compute_correlations = ComputeCorrelations()
+        # List of input files, the text edit is only used for display.
+        self._input_files = []
 
         # Configure the help dialog.
         self.help_dialog = HelpDialog(w=700, h=500)
@@ -278,6 +405,17 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
         self.resample_images.finished.connect(self.__resampling_finished)
         self.resample_images.processing_error.connect(self._processing_error_function)
         self.resample_images.update_state_signal.connect(self.status_bar.showMessage)
+
+        self.compute_correlations.progress_signal.connect(
+            self.__on_correlation_progress
+        )
+        self.compute_correlations.finished.connect(self.__correlations_finished)
+        self.compute_correlations.processing_error.connect(
+            self._processing_error_function
+        )
+        self.compute_correlations.update_state_signal.connect(
+            self.status_bar.showMessage
+        )
         self.show()
 
     def __registration2d_warning_function(self):
@@ -400,23 +538,43 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
                 "QFileDialog.getOpenFileName()",
                 "",
                 "JSON (*.json);;All Files (*)",
+                options=ieb.file_dialog_options,
             )
             with open(file_name, "r") as fp:
                 app_config = json.load(fp)
-            # Compare md5 hashes to ensure that the images haven't been modified
+            # Compare hashes to ensure that the images haven't been modified, older
+            # configuration files use md5.
+            if "file_names_and_blake2b" in app_config:
+                hash_name = "blake2b"
+            else:
+                hash_name = "md5"
+            file_names_and_hashes = app_config[f"file_names_and_{hash_name}"]
+            # Hashing releases the GIL, so the files are read and hashed concurrently.
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(8, len(file_names_and_hashes))
+            ) as executor:
+                current_hash_values = list(
+                    executor.map(
+                        lambda file_name: file_hash(file_name, hash_name),
+                        [file_name for file_name, _ in file_names_and_hashes],
+                    )
+                )
             invalid_files = [
                 file_name
-                for file_name, md5_hash in app_config["file_names_and_md5"]
-                if file_md5(file_name) != md5_hash
+                for (file_name, file_hash_value), current_hash_value in zip(
+                    file_names_and_hashes, current_hash_values
+                )
+                if current_hash_value != file_hash_value
             ]
             if invalid_files:
                 self._error_function(
-                    "The following files md5 hash does not match their content (changed since last run):<br>"
+                    f"The following files {hash_name} hash does not match their content (changed since last run):<br>"
                     + "<br>".join(invalid_files)
                 )
                 return
-            file_names, _ = zip(*app_config["file_names_and_md5"])
-            self.input_files_edit.setText("\n".join(file_names))
+            file_names, _ = zip(*file_names_and_hashes)
+            self._input_files = list(file_names)
+            self.input_files_edit.setText("\n".join(self._input_files))
             self.channel_prefix_separator_line_edit.setText(
                 app_config["prefix_separator_character"]
             )
@@ -544,6 +702,7 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
             "QFileDialog.getOpenFileNames()",
             "",
             "Imaris Images (*.ims);;All Files (*)",
+            options=ieb.file_dialog_options,
         )
         if file_names:
             if len(file_names) == 1:
@@ -551,7 +710,8 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
                     "Invalid input, only one file selected. Registration requires two or more files."
                 )
                 return
-            self.input_files_edit.setText("\n".join(file_names))
+            self._input_files = list(file_names)
+            self.input_files_edit.setText("\n".join(self._input_files))
             self.input_files_next_button.setEnabled(True)
             self.output_file_line_edit.setText(
                 os.path.join(os.path.dirname(file_names[0]), "output.ims")
@@ -559,7 +719,11 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
 
     def __browse_select_output_callback(self):
         output_file_name, _ = QFileDialog.getSaveFileName(
-            self, "Save Combined Volume", "", "ims(*.ims)"
+            self,
+            "Save Combined Volume",
+            "",
+            "ims(*.ims)",
+            options=ieb.file_dialog_options,
         )
         if output_file_name:
             self.output_file_line_edit.setText(output_file_name)
@@ -633,12 +797,14 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
     def __configure_and_show_registration_setup_widget(self):
         problematic_images = []
         self.all_channels = []
+        self.all_metadata = []
         pixel_types = []
-        file_names = self.input_files_edit.toPlainText().split("\n")
+        file_names = self._input_files
         channel_prefix_separator = self.channel_prefix_separator_line_edit.text()
         image_resolutions = []
         for file_name in file_names:
-            metadata = sio.read_metadata(file_name)
+            metadata = read_metadata(file_name)
+            self.all_metadata.append(metadata)
             pixel_types.append(sio.supported_pixel_types[metadata["sitk_pixel_type"]])
             image_resolutions.append(len(metadata["sizes"]))
             current_channel_names = [
@@ -647,13 +813,17 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
                 else channel_info["name"]
                 for _, channel_info in metadata["channels_information"]
             ]
-            self.all_channels.append(
-                dict(zip(current_channel_names, range(len(current_channel_names))))
-            )
-            # Channel name appears more than once (when the dictionary is
-            # created the last repetition of the channel name is kept, previous ones are overwritten)
-            if len(current_channel_names) != len(self.all_channels[-1]):
+            # Channel name appears more than once, the mapping from name to
+            # index is ambiguous.
+            if len(set(current_channel_names)) != len(current_channel_names):
                 problematic_images.append(file_name)
+            else:
+                self.all_channels.append(
+                    {
+                        channel_name: i
+                        for i, channel_name in enumerate(current_channel_names)
+                    }
+                )
         # All images are expected to have the same pixel type
         if len(set(pixel_types)) != 1:
             self._error_function(
@@ -672,14 +842,23 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
                 + "\n".join(problematic_images)
             )
             return
+        # Channel names common to all files, in the order of the first file.
+        common_channel_names = set(self.all_channels[0]).intersection(
+            *self.all_channels[1:]
+        )
         joint_channel_names = [
             channel_name
             for channel_name in self.all_channels[0]
-            if all(channel_name in d for d in self.all_channels[1:])
+            if channel_name in common_channel_names
         ]
         if not joint_channel_names:
             self._error_function("Given files do not have a commonly named channel.")
             return
+        # Index of each file's first channel in the combined registered image.
+        channel_counts = [
+            len(metadata["channels_information"]) for metadata in self.all_metadata
+        ]
+        self.channel_offsets = [0] + list(itertools.accumulate(channel_counts))[:-1]
         self.fixed_image_combo.addItems(file_names)
         self.registration_channel_combo.addItems(joint_channel_names)
         # We cannot display actual resolutions because they will differ between
@@ -690,8 +869,9 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
         resolution_strs[0] = resolution_strs[0] + " (maximal resolution)"
         resolution_strs[-1] = resolution_strs[-1] + " (minimal resolution)"
         self.start_resolution_combo.addItems(resolution_strs)
-        # Check image dimensions and set the registration defaults accordingly.
-        metadata = sio.read_metadata(file_name)
+        # Check the fixed image dimensions and set the registration defaults
+        # accordingly.
+        metadata = self.all_metadata[self.fixed_image_combo.currentIndex()]
         # 3D registration, default is FFT+3D affine
         if metadata["sizes"][0][2] > 1:
             self.do_fft_initialization_cb.setChecked(True)
@@ -719,6 +899,10 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
         self.save_correlation_data_button.clicked.connect(self.__compute_correlations)
         input_layout.addWidget(self.save_correlation_data_button)
 
+        self.correlation_progress = QProgressBar()
+        self.correlation_progress.setMaximum(100)
+        input_layout.addWidget(self.correlation_progress)
+
         layout = QHBoxLayout()
         layout.setAlignment(Qt.AlignRight)
         self.restart_button = QPushButton("Restart")
@@ -745,99 +929,89 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
     def __compute_correlations(self):
         self.restart_button.setEnabled(False)
         self.save_correlation_data_button.setEnabled(False)
-        selected_channel_names = [
+        self.processing_error = False
+        self.correlation_progress.setValue(0)
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        self.compute_correlations.reset()
+        self.compute_correlations.channel_names = [
             self.correlation_cb_layout.itemAt(i).widget().text()
             for i in range(self.correlation_cb_layout.count())
             if self.correlation_cb_layout.itemAt(i).widget().isChecked()
         ]
+        self.compute_correlations.file_names = self.all_file_names
+        self.compute_correlations.channel_indexes = self.all_channels
+        self.compute_correlations.channel_offsets = self.channel_offsets
+        self.compute_correlations.resample_size = self.resample_size
+        self.compute_correlations.resample_spacing = self.resample_spacing
+        self.compute_correlations.resample_origin = self.resample_origin
+        self.compute_correlations.registered_file_name = (
+            self.output_file_line_edit.text()
+        )
+        self.compute_correlations.start()
 
-        for channel_name in selected_channel_names:
-            images = []
-
-            # Correlation before registration aligns the images to the resample_origin
-            # so that the images overlap in physical space.
-            for file_name, channel_indexes in zip(
-                self.all_file_names, self.all_channels
-            ):
-                img = sio.read(
-                    file_name=file_name, channel_index=channel_indexes[channel_name]
-                )
-                images.append(
-                    sitk.Resample(
-                        img,
-                        self.resample_size,
-                        sitk.TranslationTransform(
-                            3,
-                            [
-                                io - ro
-                                for io, ro in zip(img.GetOrigin(), self.resample_origin)
-                            ],
-                        ),
-                        sitk.sitkLinear,
-                        self.resample_origin,
-                        self.resample_spacing,
-                    )
-                )
-            corr_coef_before = np.corrcoef(
-                [sitk.GetArrayViewFromImage(img).ravel() for img in images]
-            )
-
-            prev_index = 0
-            images = []
-            for file_name, channel_indexes in zip(
-                self.all_file_names, self.all_channels
-            ):
-                index = prev_index + channel_indexes[channel_name]
-                images.append(
-                    sio.read(
-                        file_name=self.output_file_line_edit.text(), channel_index=index
-                    )
-                )
-                prev_index = prev_index + len(
-                    sio.read_metadata(file_name)["channels_information"]
-                )
-            corr_coef_after = np.corrcoef(
-                [sitk.GetArrayViewFromImage(img).ravel() for img in images]
-            )
+    def __on_correlation_progress(self, value):
+        self.correlation_progress.setValue(value)
 
+    def __correlations_finished(self):
+        QApplication.restoreOverrideCursor()
+        self.status_bar.clearMessage()
+        if not self.processing_error:
+            # The figures are created on the GUI thread, matplotlib's pyplot
+            # interface is not thread safe.
             output_prefix = os.path.splitext(self.output_file_line_edit.text())[0]
             label_names = [
                 os.path.splitext(os.path.basename(file_name))[0]
                 for file_name in self.all_file_names
             ]
-            self.__save_correlation_matrix(
-                corr_coef_before,
-                title=channel_name + " Before Registration",
-                output_file_name=output_prefix
-                + "_before_registration_"
-                + channel_name
-                + ".pdf",
-                file_name_labels=label_names,
-            )
-            self.__save_correlation_matrix(
-                corr_coef_after,
-                title=channel_name + " After Registration",
-                output_file_name=output_prefix
-                + "_after_registration_"
-                + channel_name
-                + ".pdf",
-                file_name_labels=label_names,
+            # A single figure is reused for all the correlation matrices.
+            fig = plt.figure(figsize=(15, 15))
+            try:
+                for (
+                    channel_name,
+                    corr_coef_before,
+                    corr_coef_after,
+                ) in self.compute_correlations.correlations:
+                    self.__save_correlation_matrix(
+                        fig,
+                        corr_coef_before,
+                        title=channel_name + " Before Registration",
+                        output_file_name=output_prefix
+                        + "_before_registration_"
+                        + channel_name
+                        + ".pdf",
+                        file_name_labels=label_names,
+                    )
+                    self.__save_correlation_matrix(
+                        fig,
+                        corr_coef_after,
+                        title=channel_name + " After Registration",
+                        output_file_name=output_prefix
+                        + "_after_registration_"
+                        + channel_name
+                        + ".pdf",
+                        file_name_labels=label_names,
+                    )
+            finally:
+                # pyplot keeps all figures alive until they are explicitly closed.
+                plt.close(fig)
+            QMessageBox().information(
+                self, "Message", "Correlation computations completed."
             )
-
-        QMessageBox().information(
-            self, "Message", "Correlation computations completed."
-        )
         self.restart_button.setEnabled(True)
         self.save_correlation_data_button.setEnabled(True)
 
     def __save_correlation_matrix(
-        self, corr_mat, output_file_name, file_name_labels, title=None
+        self, fig, corr_mat, output_file_name, file_name_labels, title=None
     ):
         # Create an image from the correlation values, squares with color corrosponding
-        # to value, default color map (viridis)
-        fig, ax = plt.subplots(figsize=(15, 15))
+        # to value, default color map (viridis). The figure's previous content is
+        # cleared.
+        fig.clf()
+        ax = fig.add_subplot()
         ax.set_aspect(1)
-        im = ax.imshow(corr_mat, origin="lower", vmin=0, vmax=1.0)
+        im = ax.imshow(
+            corr_mat, origin="lower", vmin=0, vmax=1.0, interpolation="nearest"
+        )
 
         width, height = corr_mat.shape
 
@@ -846,27 +1020,27 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
             fontsize = "small"
         fig.colorbar(im)
 
-        # Write the correlation values onto the axes
-        for i in range(width):
-            for j in range(height):
-                ax.text(
-                    j,
-                    i,
-                    f"{corr_mat[i, j]:.2f}",
-                    ha="center",
-                    va="center",
-                    color="w",
-                    fontsize=fontsize,
-                )
+        # Write the correlation values onto the axes, all labels are formatted
+        # at once and share the text properties. For large matrices the values
+        # are not readable, so only the colors are shown.
+        if corr_mat.size <= 400:
+            labels = np.char.mod("%.2f", corr_mat)
+            text_kwargs = dict(ha="center", va="center", color="w", fontsize=fontsize)
+            for i, j in itertools.product(range(width), range(height)):
+                ax.text(j, i, labels[i, j], **text_kwargs)
+        else:
+            ax.set_xlabel(f"{width} images, correlation values not shown")
         # Write the file names as tick marks
-        plt.yticks(range(width), file_name_labels[:width], rotation=90, va="center")
-        plt.xticks(range(height), file_name_labels[:height])
+        ax.set_yticks(range(width))
+        ax.set_yticklabels(file_name_labels[:width], rotation=90, va="center")
+        ax.set_xticks(range(height))
+        ax.set_xticklabels(file_name_labels[:height])
 
         if title is not None:
-            plt.title(title)
+            ax.set_title(title)
         # File format is determined from the file name extension. vector formats
         # (pdf, ps, eps, svg) are preferred.
-        plt.savefig(output_file_name, dpi=150)
+        fig.savefig(output_file_name, dpi=150)
 
     def __register(self):
         self.registration_setup_register_button.setEnabled(False)
@@ -876,7 +1050,7 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
         # for groupwise registration. In the current implementation all images are
         # registered to one selected image.
         registration_channel_name = self.registration_channel_combo.currentText()
-        self.all_file_names = self.input_files_edit.toPlainText().split("\n")
+        self.all_file_names = self._input_files
 
         # Configure the sitkibex top level logger to report everything and set a handler
         # which will post the messages to a GUI component by emitting a Qt signal
@@ -930,8 +1104,14 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
             fp.write(self.registration_stdout_edit.toPlainText())
         # Save the application settings used for registration (reproducible registration)
         file_names, _ = zip(*self.register_images.registration_channel_information)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(8, len(file_names))
+        ) as executor:
+            hash_values = list(executor.map(file_hash, file_names))
         application_settings = {
-            "file_names_and_md5": [[name, file_md5(name)] for name in file_names],
+            "file_names_and_blake2b": [
+                [name, hash_value] for name, hash_value in zip(file_names, hash_values)
+            ],
             "registration_channel_name": self.registration_channel_combo.currentText(),
             "fixed_image": str(self.fixed_image_combo.currentText()),
             "prefix_separator_character": self.channel_prefix_separator_line_edit.text(),
@@ -945,6 +1125,17 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
             "expand_factor": self.register_images.expand_factor,
             "start_resolution": self.start_resolution_combo.currentIndex(),
         }
+        # Export the transformations, one per input file in the order of the file
+        # names, for use by external tools. They are not read back by the program.
+        if not self.processing_error:
+            transform_file_names = [
+                f"{output_prefix}_{i}.tfm" for i in range(len(file_names))
+            ]
+            for tx, transform_file_name in zip(
+                self.registration_results, transform_file_names
+            ):
+                sitk.WriteTransform(tx, transform_file_name)
+            application_settings["transform_file_names"] = transform_file_names
         with open(output_prefix + ".json", "w") as fp:
             json.dump(application_settings, fp)
 
@@ -970,6 +1161,9 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
     def __resample(self):
         self.resample_button.setEnabled(False)
         QApplication.setOverrideCursor(Qt.WaitCursor)
+        # Registration is done, don't keep the fixed image in memory during
+        # resampling and correlation analysis.
+        self.register_images.clear_fixed_image_cache()
         self.resample_images.reset()
         self.resample_images.file_names = self.all_file_names
         self.resample_images.transformations = self.registration_results
@@ -1002,6 +1196,7 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
         self.auto_mask_cb.setChecked(False)
         self.samples_line_edit.setText("5000")
 
+        self._input_files = []
         self.input_files_edit.setText("")
         self.channel_prefix_separator_line_edit.setText("")
         self.input_files_next_button.setEnabled(False)
@@ -1013,12 +1208,16 @@ class RegisterSameChannelDialog(ieb.ImarisExtensionBase):
 
         self.registration_stdout_edit.setText("")
         self.resampling_progress.setValue(0)
+        self.correlation_progress.setValue(0)
         self.resample_button.setEnabled(False)
 
-        # Remove all widgets from layout, done in reverse order because
-        # removing from the begining shifts the rest of the items
-        for i in reversed(range(self.correlation_cb_layout.count())):
-            self.correlation_cb_layout.itemAt(i).widget().setParent(None)
+        # Remove all widgets from layout, always taking the first item. Each
+        # takeAt is constant time and the widgets are released by Qt once control
+        # returns to the event loop.
+        item = self.correlation_cb_layout.takeAt(0)
+        while item is not None:
+            item.widget().deleteLater()
+            item = self.correlation_cb_layout.takeAt(0)
 
         self.status_bar.clearMessage()
 
@@ -1037,8 +1236,17 @@ class RegisterImages(QThread):
 
     def __init__(self):
         super(RegisterImages, self).__init__()
+        # The most recently read fixed image and the key identifying it (file name,
+        # modification time, size, channel and resolution). The image is reused when
+        # registration is repeated with the same fixed image and different settings.
+        # It is released by clear_fixed_image_cache() once registration is done and
+        # its results are used for resampling.
+        self._fixed_image_cache = (None, None)
         self.reset()
 
+    def clear_fixed_image_cache(self):
+        self._fixed_image_cache = (None, None)
+
     def reset(self):
         # Registration configuration
         self.do_fft_initialization = True
@@ -1071,7 +1279,7 @@ class RegisterImages(QThread):
             return
         # Get the data used for resampling after registration. Registration may not necesserily
         # use the full resolution image and we want resampling to be on the full resolution.
-        meta_data = sio.read_metadata(
+        meta_data = read_metadata(
             self.registration_channel_information[self.fixed_image_index][0]
         )
         self.resample_size = meta_data["sizes"][0]
@@ -1079,15 +1287,29 @@ class RegisterImages(QThread):
         self.resample_origin = meta_data["origin"]
 
         try:
-            fixed_image = sio.read(
-                file_name=self.registration_channel_information[self.fixed_image_index][
-                    0
-                ],
-                channel_index=self.registration_channel_information[
-                    self.fixed_image_index
-                ][1],
-                resolution_index=self.start_resolution,
+            (
+                fixed_file_name,
+                fixed_channel_index,
+            ) = self.registration_channel_information[self.fixed_image_index]
+            file_stat = os.stat(fixed_file_name)
+            fixed_image_key = (
+                fixed_file_name,
+                file_stat.st_mtime_ns,
+                file_stat.st_size,
+                fixed_channel_index,
+                self.start_resolution,
             )
+            cached_key, fixed_image = self._fixed_image_cache
+            if cached_key != fixed_image_key:
+                fixed_image = sio.read(
+                    file_name=fixed_file_name,
+                    channel_index=fixed_channel_index,
+                    resolution_index=self.start_resolution,
+                )
+                self._fixed_image_cache = (fixed_image_key, fixed_image)
+            # sitkibex may modify the spacing and origin of a float32 fixed image in
+            # place, so register a copy (the pixel buffer is shared, not copied).
+            fixed_image = sitk.Image(fixed_image)
             self.registration_results = [None] * len(
                 self.registration_channel_information
             )
@@ -1181,6 +1403,10 @@ class ResampleImages(QThread):
         self.resample_origin = None
 
         self.output_file_name = None
+        # Channels up to this size, in bytes, are read ahead while the previous
+        # channel is resampled. Larger channels are read only when needed so that
+        # at most two full channels (input and output) are in memory.
+        self.read_ahead_max_bytes = 256 * 1048576
 
     def run(self):
         if (
@@ -1198,46 +1424,197 @@ class ResampleImages(QThread):
         # were corrupt, but no memory allocation exception was thrown, so the
         # original code was converted to per-channel resampling.
         try:
-            progress_values = []
-            channel_indexes = []
-            fnames = []
-            transforms = []
-            for file_name, tx in zip(self.file_names, self.transformations):
-                meta_data = sio.read_metadata(file_name)
-                num_channels = len(meta_data["channels_information"])
-                fnames.extend([file_name] * num_channels)
-                channel_indexes.extend(list(range(num_channels)))
-                progress_values.extend([np.prod(meta_data["sizes"][0])] * num_channels)
-                transforms.extend([tx] * num_channels)
-            progress_values = np.cumsum(progress_values)
+            self.update_state_signal.emit("Reading image information...")
+            meta_data = [read_metadata(file_name) for file_name in self.file_names]
+            num_channels = [len(md["channels_information"]) for md in meta_data]
+            fnames = np.repeat(self.file_names, num_channels).tolist()
+            channel_indexes = [c for n in num_channels for c in range(n)]
+            transforms = [
+                tx
+                for tx, n in zip(self.transformations, num_channels)
+                for _ in range(n)
+            ]
+            channel_bytes = np.repeat(
+                [
+                    np.prod(md["sizes"][0])
+                    * sitk.Image(
+                        [1, 1, 1], md["sitk_pixel_type"]
+                    ).GetSizeOfPixelComponent()
+                    for md in meta_data
+                ],
+                num_channels,
+            )
+            progress_values = np.cumsum(
+                np.repeat([np.prod(md["sizes"][0]) for md in meta_data], num_channels)
+            )
             progress_values = list(
                 map(int, progress_values / progress_values[-1] * 100)
             )
-            first_channel = True
-            for file_name, c_index, tx, prog in zip(
-                fnames, channel_indexes, transforms, progress_values
-            ):
-                self.update_state_signal.emit("Reading channel...")
-                sitk_image = sio.read(file_name, channel_index=c_index)
-                self.update_state_signal.emit("Resampling channel...")
-                resampled_image = sitk.Resample(
-                    sitk_image,
-                    self.resample_size,
-                    tx,
-                    sitk.sitkLinear,
-                    self.resample_origin,
-                    self.resample_spacing,
+            # The output grid and interpolator are the same for all channels, only
+            # the transformation changes.
+            resampler = sitk.ResampleImageFilter()
+            resampler.SetSize(self.resample_size)
+            resampler.SetOutputOrigin(self.resample_origin)
+            resampler.SetOutputSpacing(self.resample_spacing)
+            resampler.SetInterpolator(sitk.sitkLinear)
+            # The resampled channel is saved in the background while the next
+            # channel is read. The previous write completes, and its resampled
+            # channel is released, before the next channel is resampled so that at
+            # most one output channel is in memory. Small channels are also read
+            # ahead, in the background, while the current channel is resampled.
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=1
+            ) as read_executor, concurrent.futures.ThreadPoolExecutor(
+                max_workers=1
+            ) as write_executor:
+                next_image = None
+                pending_write = None
+                for i, (tx, prog) in enumerate(zip(transforms, progress_values)):
+                    if next_image is None:
+                        self.update_state_signal.emit("Reading channel...")
+                        next_image = read_executor.submit(
+                            sio.read, fnames[i], channel_index=channel_indexes[i]
+                        )
+                    sitk_image = next_image.result()
+                    next_image = None
+                    if pending_write is not None:
+                        pending_write[0].result()
+                        self.progress_signal.emit(pending_write[1])
+                        pending_write = resampled_image = None
+                    if (
+                        i + 1 < len(fnames)
+                        and channel_bytes[i + 1] <= self.read_ahead_max_bytes
+                    ):
+                        next_image = read_executor.submit(
+                            sio.read,
+                            fnames[i + 1],
+                            channel_index=channel_indexes[i + 1],
+                        )
+                    self.update_state_signal.emit("Resampling channel...")
+                    resampler.SetTransform(tx)
+                    resampled_image = resampler.Execute(sitk_image)
+                    # Copy the meta-data dictionary to the resampled image.
+                    for k in sitk_image.GetMetaDataKeys():
+                        resampled_image.SetMetaData(k, sitk_image.GetMetaData(k))
+                    sitk_image = None
+                    self.update_state_signal.emit("Saving channel...")
+                    pending_write = (
+                        write_executor.submit(
+                            sio.write if i == 0 else sio.append_channels,
+                            resampled_image,
+                            self.output_file_name,
+                        ),
+                        prog,
+                    )
+                pending_write[0].result()
+                self.progress_signal.emit(pending_write[1])
+        # Use the stack trace as the error message to provide enough
+        # detailes for debugging.
+        except Exception:
+            self.processing_error.emit(
+                "Exception occurred during computation:\n" + traceback.format_exc()
+            )
+
+
+class ComputeCorrelations(QThread):
+    progress_signal = Signal(int)
+    processing_error = Signal(str)
+    update_state_signal = Signal(str)
+
+    def __init__(self):
+        super(ComputeCorrelations, self).__init__()
+        self.reset()
+
+    def reset(self):
+        # The names of the channels for which we compute the correlations.
+        self.channel_names = None
+        # The input file names, for each file a dictionary mapping channel names to
+        # channel indexes and the index of its first channel in the combined
+        # registered image.
+        self.file_names = None
+        self.channel_indexes = None
+        self.channel_offsets = None
+        # The parameters describing the fixed image used for registration.
+        self.resample_size = None
+        self.resample_spacing = None
+        self.resample_origin = None
+        # The combined registered image.
+        self.registered_file_name = None
+        # By default the correlations are computed from all the pixels, in blocks
+        # of bounded size (see correlation_matrix). Setting this to a number of
+        # pixels estimates them from at most that many pixels per image instead.
+        self.max_samples = None
+        # Results, list of tuples (channel name, correlation matrix before
+        # registration, correlation matrix after registration).
+        self.correlations = []
+
+    def run(self):
+        if (
+            self.channel_names is None
+            or self.file_names is None
+            or self.channel_indexes is None
+            or self.channel_offsets is None
+            or self.resample_size is None
+            or self.resample_spacing is None
+            or self.resample_origin is None
+            or self.registered_file_name is None
+        ):
+            return
+        try:
+            # The files are opened once and read for every selected channel.
+            with contextlib.ExitStack() as stack:
+                readers = [
+                    stack.enter_context(sio.open_reader(file_name))
+                    for file_name in self.file_names
+                ]
+                registered_reader = stack.enter_context(
+                    sio.open_reader(self.registered_file_name)
                 )
-                # Copy the meta-data dictionary to the resampled image.
-                for k in sitk_image.GetMetaDataKeys():
-                    resampled_image.SetMetaData(k, sitk_image.GetMetaData(k))
-                self.update_state_signal.emit("Saving channel...")
-                if first_channel:
-                    sio.write(resampled_image, self.output_file_name)
-                    first_channel = False
-                else:
-                    sio.append_channels(resampled_image, self.output_file_name)
-                self.progress_signal.emit(prog)
+                for i, channel_name in enumerate(self.channel_names):
+                    self.update_state_signal.emit(
+                        f"Computing correlations before registration ({channel_name})..."
+                    )
+                    images = []
+                    # Correlation before registration aligns the images to the resample_origin
+                    # so that the images overlap in physical space.
+                    for reader, channel_indexes in zip(readers, self.channel_indexes):
+                        img = sio.read_from(
+                            reader, channel_index=channel_indexes[channel_name]
+                        )
+                        images.append(
+                            align_to_resample_grid(
+                                img,
+                                self.resample_size,
+                                self.resample_origin,
+                                self.resample_spacing,
+                            )
+                        )
+                    corr_coef_before = correlation_matrix(
+                        images, max_samples=self.max_samples
+                    )
+
+                    self.update_state_signal.emit(
+                        f"Computing correlations after registration ({channel_name})..."
+                    )
+                    images = [
+                        sio.read_from(
+                            registered_reader,
+                            channel_index=channel_offset
+                            + channel_indexes[channel_name],
+                        )
+                        for channel_offset, channel_indexes in zip(
+                            self.channel_offsets, self.channel_indexes
+                        )
+                    ]
+                    corr_coef_after = correlation_matrix(
+                        images, max_samples=self.max_samples
+                    )
+                    self.correlations.append(
+                        (channel_name, corr_coef_before, corr_coef_after)
+                    )
+                    self.progress_signal.emit(
+                        int((i + 1) * 100 / len(self.channel_names))
+                    )
         # Use the stack trace as the error message to provide enough
         # detailes for debugging.
         except Exception:
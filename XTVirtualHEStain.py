@@ -29,8 +29,10 @@
 #    </CustomTools>
 
 import os
+import concurrent.futures
 import inspect
 import traceback
+import numpy as np
 
 from PySide6.QtWidgets import (
     QWidget,
@@ -56,6 +58,92 @@ import imaris_extension_base as ieb
 from help_dialog import HelpDialog
 
 
+def gareau_virtual_stain(h_channel, e_channel):
+    """
+    Virtual H&E stain, Gareau 2009. The rescaled, [0,1], Hematoxylin and Eosin
+    surrogate channels are float32 arrays, the result is a uint8 array with the
+    RGB channels as the last axis.
+    """
+    virtual_he = np.stack(
+        [
+            1.0 - 0.7 * h_channel,
+            1.0 - 0.8 * h_channel - 0.45 * e_channel,
+            1.0 - 0.12 * e_channel,
+        ],
+        axis=-1,
+    )
+    virtual_he *= 255.0
+    return np.clip(virtual_he, 0, 255, out=virtual_he).astype(np.uint8)
+
+
+def giacomelli_virtual_stain(h_channel, e_channel):
+    """
+    Virtual H&E stain, Giacomelli 2016. Same input and output as
+    gareau_virtual_stain.
+    """
+    virtual_he = np.stack(
+        [
+            (np.exp(-0.125 * e_channel) - 0.0821)
+            * (np.exp(-2.15 * h_channel) - 0.0821),
+            (np.exp(-2.5 * e_channel) - 0.0821) * (np.exp(-2.5 * h_channel) - 0.0821),
+            (np.exp(-1.36 * e_channel) - 0.0821) * (np.exp(-0.75 * h_channel) - 0.0821),
+        ],
+        axis=-1,
+    )
+    virtual_he *= 1.18679236 * 255.0
+    return np.clip(virtual_he, 0, 255, out=virtual_he).astype(np.uint8)
+
+
+def slices_intensity_mapping(arr):
+    """
+    Per slice (first axis) offset and scale, float32, which linearly map the slice's
+    intensities to [0,1], (intensity - offset) * scale. Constant slices are mapped
+    to zero (same as sitk.RescaleIntensity).
+    """
+    # The per slice extrema are computed on the stored (usually uint8) values,
+    # a quarter of the memory traffic of the float32 copy.
+    slices_min = arr.min(axis=(1, 2), keepdims=True).astype(np.float32)
+    slices_range = arr.max(axis=(1, 2), keepdims=True).astype(np.float32) - slices_min
+    slices_scale = np.divide(
+        1.0, slices_range, out=np.zeros_like(slices_range), where=slices_range > 0
+    )
+    return slices_min, slices_scale
+
+
+def rescale_slices(arr):
+    """
+    Linearly map the intensities of each slice (first axis) of the array to [0,1],
+    as float32. Integer pixel types other than uint8 are also rescaled in float32,
+    sitk.RescaleIntensity kept their pixel type which reduced them to 0 and 1.
+    """
+    slices_min, slices_scale = slices_intensity_mapping(arr)
+    rescaled = arr.astype(np.float32)
+    rescaled -= slices_min
+    rescaled *= slices_scale
+    return rescaled
+
+
+def stain_uint8_slices(h_arr, e_arr, virtual_stain, virtual_he):
+    """
+    Stain uint8 slices using a lookup table per slice. The rescaled intensities of
+    a slice take at most 256 values per channel, so the staining algorithm is
+    evaluated once for all (h, e) value pairs and the pixels are mapped through
+    the resulting 256x256 RGB table. The RGB values are written into virtual_he,
+    a uint8 array with the shape of the slices and a trailing axis of size 3.
+    """
+    h_min, h_scale = slices_intensity_mapping(h_arr)
+    e_min, e_scale = slices_intensity_mapping(e_arr)
+    values = np.arange(256, dtype=np.float32)
+    for i in range(h_arr.shape[0]):
+        h_values, e_values = np.meshgrid(
+            (values - h_min[i, 0, 0]) * h_scale[i, 0, 0],
+            (values - e_min[i, 0, 0]) * e_scale[i, 0, 0],
+            indexing="ij",
+        )
+        table = virtual_stain(h_values, e_values)
+        virtual_he[i] = table[h_arr[i], e_arr[i]]
+
+
 def XTVirtualHEStain(imaris_id=None):
 
     app = QApplication([])
@@ -193,6 +281,7 @@ class VirtualHEStainDialog(ieb.ImarisExtensionBase):
             "QFileDialog.getOpenFileNames()",
             "",
             "Imaris Images (*.ims);;All Files (*)",
+            options=ieb.file_dialog_options,
         )
         if file_names:
             self.input_files_edit.setText("\n".join(file_names))
@@ -290,7 +379,11 @@ class VirtualHEStainDialog(ieb.ImarisExtensionBase):
 
     def __browse_output_dir_callback(self):
         dir_name = str(
-            QFileDialog.getExistingDirectory(self, "Select Output Directory")
+            QFileDialog.getExistingDirectory(
+                self,
+                "Select Output Directory",
+                options=ieb.file_dialog_options | QFileDialog.ShowDirsOnly,
+            )
         )
         if dir_name:
             self.output_dir_line_edit.setText(dir_name)
@@ -324,8 +417,8 @@ class VirtualHEStainer(QThread):
     def __init__(self):
         super(VirtualHEStainer, self).__init__()
         self.algorithms = {
-            "Giacomelli 2016": self.__giacomelli_virtual_stain,
-            "Gareau 2009": self.__gareau_virtual_stain,
+            "Giacomelli 2016": giacomelli_virtual_stain,
+            "Gareau 2009": gareau_virtual_stain,
         }
         self.reset()
 
@@ -337,38 +430,25 @@ class VirtualHEStainer(QThread):
         self.algorithm_name = list(self.algorithms.keys())[0]
         # only parameter that is related to the GUI
         self.total_pixels = None
-
-    def __gareau_virtual_stain(self, h_channel, e_channel):
-        virtual_he = [
-            1.0 - 0.7 * h_channel,
-            1.0 - 0.8 * h_channel - 0.45 * e_channel,
-            1.0 - 0.12 * e_channel,
+        # The images are processed in blocks of slices, each block is at most
+        # this size per channel when converted to float32 (at least one slice).
+        self.block_bytes = 32 * 1048576
+
+    def __read_slices(self, reader, channel_indexes, z_start, z_end):
+        """
+        Read the slices [z_start, z_end) of the given channels from an Imaris file
+        opened with sio.open_reader.
+        """
+        image_size = reader.meta_data["sizes"][0]
+        sub_ranges = [
+            slice(0, image_size[0]),
+            slice(0, image_size[1]),
+            slice(z_start, z_end),
         ]
-        return sitk.Compose(
-            [
-                sitk.Clamp(c * 255.0, sitk.sitkUInt8, lowerBound=0, upperBound=255)
-                for c in virtual_he
-            ]
-        )
-
-    def __giacomelli_virtual_stain(self, h_channel, e_channel):
-        virtual_he = [
-            (sitk.Exp(-0.125 * e_channel) - 0.0821)
-            * (sitk.Exp(-2.15 * h_channel) - 0.0821)
-            * 1.18679236,
-            (sitk.Exp(-2.5 * e_channel) - 0.0821)
-            * (sitk.Exp(-2.5 * h_channel) - 0.0821)
-            * 1.18679236,
-            (sitk.Exp(-1.36 * e_channel) - 0.0821)
-            * (sitk.Exp(-0.75 * h_channel) - 0.0821)
-            * 1.18679236,
+        return [
+            sio.read_from(reader, channel_index=channel_index, sub_ranges=sub_ranges)
+            for channel_index in channel_indexes
         ]
-        return sitk.Compose(
-            [
-                sitk.Clamp(c * 255.0, sitk.sitkUInt8, lowerBound=0, upperBound=255)
-                for c in virtual_he
-            ]
-        )
 
     def get_algorithm_names(self):
         return list(self.algorithms.keys())
@@ -393,47 +473,69 @@ class VirtualHEStainer(QThread):
                 image_size = metadata_dict["sizes"][0]
                 slice_pixel_num = image_size[0] * image_size[1]
 
-                # We process the images slice by slice due to memory constraints.
-                virtual_he_slices = []
-                for slc_index in range(image_size[2]):
-                    hematoxlin_surrogate_channel = sio.read(
-                        file_name,
-                        channel_index=h_index,
-                        sub_ranges=[
-                            slice(0, image_size[0]),
-                            slice(0, image_size[1]),
-                            slice(slc_index, slc_index + 1),
-                        ],
-                    )[:, :, 0]
-                    eosin_surrogate_channel = sio.read(
-                        file_name,
-                        channel_index=e_index,
-                        sub_ranges=[
-                            slice(0, image_size[0]),
-                            slice(0, image_size[1]),
-                            slice(slc_index, slc_index + 1),
-                        ],
-                    )[:, :, 0]
-                    if hematoxlin_surrogate_channel.GetPixelID() == sitk.sitkUInt8:
-                        hematoxlin_surrogate_channel = (
-                            sitk.Cast(hematoxlin_surrogate_channel, sitk.sitkFloat32)
-                            / 255.0
-                        )
-                        eosin_surrogate_channel = (
-                            sitk.Cast(eosin_surrogate_channel, sitk.sitkFloat32) / 255.0
-                        )
-                    h_channel = sitk.RescaleIntensity(
-                        hematoxlin_surrogate_channel, 0.0, 1.0
-                    )
-                    e_channel = sitk.RescaleIntensity(eosin_surrogate_channel, 0.0, 1.0)
-                    virtual_he_slices.append(
-                        self.algorithms[self.algorithm_name](h_channel, e_channel)
-                    )
-                    current_work_done += slice_pixel_num
-                    self.progress_signal.emit(
-                        int(100 * current_work_done / self.total_pixels)
+                # We process the images in blocks of slices due to memory constraints.
+                slices_per_block = max(1, self.block_bytes // (4 * slice_pixel_num))
+                virtual_stain = self.algorithms[self.algorithm_name]
+                # The result is written directly into the output array, slices in
+                # z,y,x order with the RGB channels as the last axis.
+                virtual_he_arr = np.empty(
+                    (image_size[2], image_size[1], image_size[0], 3), dtype=np.uint8
+                )
+                # The next block is read in the background while the current one is
+                # stained, only one block is read ahead.
+                with sio.open_reader(
+                    file_name
+                ) as reader, concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1
+                ) as read_executor:
+                    next_block = read_executor.submit(
+                        self.__read_slices,
+                        reader,
+                        [h_index, e_index],
+                        0,
+                        min(slices_per_block, image_size[2]),
                     )
-                virtual_he = sitk.JoinSeries(virtual_he_slices)
+                    for block_start in range(0, image_size[2], slices_per_block):
+                        block_end = min(block_start + slices_per_block, image_size[2])
+                        (
+                            hematoxlin_surrogate_channel,
+                            eosin_surrogate_channel,
+                        ) = next_block.result()
+                        if block_end < image_size[2]:
+                            next_block = read_executor.submit(
+                                self.__read_slices,
+                                reader,
+                                [h_index, e_index],
+                                block_end,
+                                min(block_end + slices_per_block, image_size[2]),
+                            )
+                        h_arr = sitk.GetArrayViewFromImage(hematoxlin_surrogate_channel)
+                        e_arr = sitk.GetArrayViewFromImage(eosin_surrogate_channel)
+                        # For uint8 slices that are larger than the 256x256 lookup
+                        # table, evaluating the algorithm on the table is cheaper.
+                        if (
+                            h_arr.dtype == np.uint8
+                            and e_arr.dtype == np.uint8
+                            and slice_pixel_num > 256 * 256
+                        ):
+                            stain_uint8_slices(
+                                h_arr,
+                                e_arr,
+                                virtual_stain,
+                                virtual_he_arr[block_start:block_end],
+                            )
+                        else:
+                            virtual_he_arr[block_start:block_end] = virtual_stain(
+                                rescale_slices(h_arr),
+                                rescale_slices(e_arr),
+                            )
+                        current_work_done += slice_pixel_num * (block_end - block_start)
+                        self.progress_signal.emit(
+                            int(100 * current_work_done / self.total_pixels)
+                        )
+                virtual_he = sitk.GetImageFromArray(virtual_he_arr, isVector=True)
+                # SimpleITK images own their pixel buffer, the array is no longer needed.
+                del virtual_he_arr
                 virtual_he.SetOrigin(metadata_dict["origin"])
                 virtual_he.SetSpacing(metadata_dict["spacings"][0])
 
@@ -16,10 +16,24 @@
 #
 # =========================================================================
 
+import functools
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QTextBrowser
 from docutils.core import publish_string
 
 
+@functools.lru_cache(maxsize=None)
+def _rst_to_html(txt, pygments_css_file_name=None):
+    # Use docutils publish_string method to convert the rst to html.
+    # Then insert the css into the html.
+    html_str = publish_string(txt, writer_name="html").decode("utf-8")
+    if pygments_css_file_name:
+        style_idx = html_str.index("</style>")
+        with open(pygments_css_file_name, "r") as fp:
+            css_str = fp.read()
+            html_str = html_str[:style_idx] + css_str + html_str[style_idx:]
+    return html_str
+
+
 class HelpDialog(QWidget):
     """
     Dialog for displaying a single html page with text converted from
@@ -44,14 +58,20 @@ class HelpDialog(QWidget):
         self.help_text_edit.setOpenExternalLinks(True)
         layout.addWidget(self.help_text_edit)
         self.resize(w, h)
+        self._rst_text = None
 
     def set_rst_text(self, txt, pygments_css_file_name=None):
-        # Use docutils publish_string method to convert the rst to html.
-        # Then insert the css into the html and display that.
-        html_str = publish_string(txt, writer_name="html").decode("utf-8")
-        if pygments_css_file_name:
-            style_idx = html_str.index("</style>")
-            with open(pygments_css_file_name, "r") as fp:
-                css_str = fp.read()
-                html_str = html_str[:style_idx] + css_str + html_str[style_idx:]
-        self.help_text_edit.setHtml(html_str)
+        # Converting the rst to html is relatively slow and the help is often
+        # never viewed, so the conversion is deferred until the dialog is shown.
+        self._rst_text = (txt, pygments_css_file_name)
+        if self.isVisible():
+            self._update_html()
+
+    def showEvent(self, event):
+        self._update_html()
+        super(HelpDialog, self).showEvent(event)
+
+    def _update_html(self):
+        if self._rst_text is not None:
+            self.help_text_edit.setHtml(_rst_to_html(*self._rst_text))
+            self._rst_text = None
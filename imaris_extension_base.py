@@ -16,7 +16,7 @@
 #
 # =========================================================================
 
-from PySide6.QtWidgets import QMainWindow, QErrorMessage
+from PySide6.QtWidgets import QMainWindow, QErrorMessage, QFileDialog
 from PySide6.QtCore import Signal, QObject
 import PySide6.QtGui
 import SimpleITK as sitk
@@ -31,6 +31,13 @@ import logging
 # The 'macOS' style is only available on OSX.
 style = "Windows"
 
+# Options used by all file dialogs. Custom directory icons and symbolic link
+# resolution stat every entry in the browsed directory, which makes browsing
+# large or network mounted directories slow.
+file_dialog_options = (
+    QFileDialog.DontUseCustomDirectoryIcons | QFileDialog.DontResolveSymlinks
+)
+
 
 class ImarisExtensionBase(QMainWindow):
     def __init__(self):
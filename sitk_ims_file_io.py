@@ -64,6 +64,8 @@ import SimpleITK as sitk
 import numpy as np
 import copy
 import datetime
+import collections
+import contextlib
 import xml.etree.ElementTree as et
 
 
@@ -136,193 +138,242 @@ def read_metadata(file_name):
                                 sitk_pixel_type: Image's SimpleITK pixel type.
 
     """  # noqa
-    meta_data_dict = {}
     with h5py.File(file_name, "r") as f:
-        if f.attrs["ImarisVersion"].tobytes().decode("UTF-8") in file_format_versions:
-            dataset_info_dirname = (
-                f.attrs["DataSetInfoDirectoryName"].tobytes().decode("UTF-8")
-            )
-            dataset_dirname = f.attrs["DataSetDirectoryName"].tobytes().decode("UTF-8")
-            time_point_number = int(
-                (
-                    f[dataset_info_dirname]["TimeInfo"]
-                    .attrs["DatasetTimePoints"]
-                    .tobytes()
-                )
-            )
-            meta_data_dict["times"] = []
-            for i in range(1, time_point_number + 1):
-                try:
-                    meta_data_dict["times"].append(
-                        datetime.datetime.strptime(
-                            f[dataset_info_dirname]["TimeInfo"]
-                            .attrs[f"TimePoint{i}"]
-                            .tobytes()
-                            .decode("UTF-8"),
-                            time_str_format,
-                        )
-                    )
-                except ValueError:
-                    meta_data_dict["times"].append(
-                        datetime.datetime.strptime(
-                            f[dataset_info_dirname]["TimeInfo"]
-                            .attrs[f"TimePoint{i}"]
-                            .tobytes()
-                            .decode("UTF-8"),
-                            fallback_time_str_format,
-                        )
-                    )
-            meta_data_dict["unit"] = (
-                f[dataset_info_dirname]["Image"].attrs["Unit"].tobytes().decode("UTF-8")
+        return _read_metadata(f)
+
+
+def read_number_of_channels(file_name):
+    """
+    Read the number of channels in the Imaris file without reading the rest of the
+    meta-data.
+
+    Parameters
+    ----------
+    file_name (str): Path to Imaris file from which we read.
+
+    Returns
+    -------
+    Number of channels in the file.
+    """
+    with h5py.File(file_name, "r") as f:
+        imaris_format_version = f.attrs["ImarisVersion"].tobytes().decode("UTF-8")
+        if imaris_format_version not in file_format_versions:
+            raise ValueError(
+                f"Unsupported imaris file format version {imaris_format_version}."
             )
-            resolution_sizes = []
-            storage_info = []
-            for i in range(len(f[dataset_dirname])):
-                resolution_name = f"ResolutionLevel {i}"
-                resolution_sizes.append(
-                    [
-                        int(
-                            f[dataset_dirname][resolution_name]["TimePoint 0"][
-                                "Channel 0"
-                            ]
-                            .attrs["ImageSizeX"]
-                            .tobytes()
-                        ),
-                        int(
-                            f[dataset_dirname][resolution_name]["TimePoint 0"][
-                                "Channel 0"
-                            ]
-                            .attrs["ImageSizeY"]
-                            .tobytes()
-                        ),
-                        int(
-                            f[dataset_dirname][resolution_name]["TimePoint 0"][
-                                "Channel 0"
-                            ]
-                            .attrs["ImageSizeZ"]
-                            .tobytes()
-                        ),
-                    ]
-                )
-                storage_info.append(
-                    [
-                        f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"][
-                            "Data"
-                        ].chunks,
-                        f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"][
-                            "Data"
-                        ].compression,
-                        f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"][
-                            "Data"
-                        ].compression_opts,
-                    ]
-                )
+        dataset_dirname = f.attrs["DataSetDirectoryName"].tobytes().decode("UTF-8")
+        # Get the number of channels from a group that is guarenteed to exist
+        return len(f[dataset_dirname]["ResolutionLevel 0"]["TimePoint 0"])
 
-            meta_data_dict["sizes"] = resolution_sizes
-            meta_data_dict["storage_settings"] = storage_info
-
-            # Coordinates of the corners of the imaris volume's bounding box
-            min_x = float(f[dataset_info_dirname]["Image"].attrs["ExtMin0"].tobytes())
-            max_x = float(f[dataset_info_dirname]["Image"].attrs["ExtMax0"].tobytes())
-            min_y = float(f[dataset_info_dirname]["Image"].attrs["ExtMin1"].tobytes())
-            max_y = float(f[dataset_info_dirname]["Image"].attrs["ExtMax1"].tobytes())
-            min_z = float(f[dataset_info_dirname]["Image"].attrs["ExtMin2"].tobytes())
-            max_z = float(f[dataset_info_dirname]["Image"].attrs["ExtMax2"].tobytes())
-            x_size = max_x - min_x
-            y_size = max_y - min_y
-            z_size = max_z - min_z
-            meta_data_dict["spacings"] = [
-                [x_size / sz[0], y_size / sz[1], z_size / sz[2]]
-                for sz in meta_data_dict["sizes"]
-            ]
 
-            # SimpleITK image origin is 0.5*(pixel spacing) from the corner of the volume.
-            meta_data_dict["origin"] = [
-                m_val + 0.5 * spc
-                for m_val, spc in zip(
-                    [min_x, min_y, min_z], meta_data_dict["spacings"][0]
-                )
-            ]
+def read_channels_information(file_name):
+    """
+    Read only the per-channel meta-data contained in the Imaris file.
 
-            # Get the number of channels from a group that is guarenteed to exist
-            num_channels = len(f[dataset_dirname]["ResolutionLevel 0"]["TimePoint 0"])
+    Parameters
+    ----------
+    file_name (str): Path to Imaris file from which we read.
 
-            # Get the pixel type
-            meta_data_dict["sitk_pixel_type"] = sitk.GetImageFromArray(
-                f[dataset_dirname]["ResolutionLevel 0"]["TimePoint 0"]["Channel 0"][
-                    "Data"
-                ][0:1, 0:1, 0:1]
-            ).GetPixelID()
+    Returns
+    -------
+    channels_information (list[(i,dict)]): Channel information tuples, same as the
+                                           channels_information entry returned by
+                                           read_metadata.
+    """
+    with h5py.File(file_name, "r") as f:
+        imaris_format_version = f.attrs["ImarisVersion"].tobytes().decode("UTF-8")
+        if imaris_format_version not in file_format_versions:
+            raise ValueError(
+                f"Unsupported imaris file format version {imaris_format_version}."
+            )
+        dataset_info_dirname = (
+            f.attrs["DataSetInfoDirectoryName"].tobytes().decode("UTF-8")
+        )
+        dataset_dirname = f.attrs["DataSetDirectoryName"].tobytes().decode("UTF-8")
+        num_channels = len(f[dataset_dirname]["ResolutionLevel 0"]["TimePoint 0"])
+        return _read_channels_information(f, dataset_info_dirname, num_channels)
 
-            # Get the per-channel metadata.
-            channels_information = []
-            for i in range(num_channels):
-                channel_information = {}
-                channel_str = f"Channel {i}"
-                channel_information["name"] = (
-                    f[dataset_info_dirname][channel_str]
-                    .attrs["Name"]
-                    .tobytes()
-                    .decode("UTF-8")
-                )
-                if channel_information["name"] == "\x00":  # null byte
-                    channel_information["name"] = ""
-                channel_information["description"] = (
-                    f[dataset_info_dirname][channel_str]
-                    .attrs["Description"]
-                    .tobytes()
-                    .decode("UTF-8")
+
+def _read_metadata(f):
+    """
+    Read the meta-data from an Imaris file that is already open. See read_metadata for
+    the contents of the returned dictionary.
+    """
+    meta_data_dict = {}
+    if f.attrs["ImarisVersion"].tobytes().decode("UTF-8") in file_format_versions:
+        dataset_info_dirname = (
+            f.attrs["DataSetInfoDirectoryName"].tobytes().decode("UTF-8")
+        )
+        dataset_dirname = f.attrs["DataSetDirectoryName"].tobytes().decode("UTF-8")
+        time_point_number = int(
+            (f[dataset_info_dirname]["TimeInfo"].attrs["DatasetTimePoints"].tobytes())
+        )
+        meta_data_dict["times"] = []
+        for i in range(1, time_point_number + 1):
+            try:
+                meta_data_dict["times"].append(
+                    datetime.datetime.strptime(
+                        f[dataset_info_dirname]["TimeInfo"]
+                        .attrs[f"TimePoint{i}"]
+                        .tobytes()
+                        .decode("UTF-8"),
+                        time_str_format,
+                    )
                 )
-                if channel_information["description"] == "\x00":  # null byte
-                    channel_information["description"] = ""
-                color_mode = (
-                    f[dataset_info_dirname][channel_str]
-                    .attrs["ColorMode"]
-                    .tobytes()
-                    .decode("UTF-8")
+            except ValueError:
+                meta_data_dict["times"].append(
+                    datetime.datetime.strptime(
+                        f[dataset_info_dirname]["TimeInfo"]
+                        .attrs[f"TimePoint{i}"]
+                        .tobytes()
+                        .decode("UTF-8"),
+                        fallback_time_str_format,
+                    )
                 )
-                # color is a list of float values in [0.0, 1.0] in r,g,b order.
-                # color table is just a longer list of colors in r,g,b order.
-                if color_mode == "BaseColor":
-                    color_info = f[dataset_info_dirname][channel_str].attrs["Color"]
-                    color_key = "color"
-                elif color_mode == "TableColor":
-                    # The actual color table is stored either as a dataset or as an attribute
-                    if "ColorTable" in f[dataset_info_dirname][channel_str].attrs:
-                        color_info = f[dataset_info_dirname][channel_str].attrs[
-                            "ColorTable"
-                        ]
-                    else:
-                        color_info = f[dataset_info_dirname][channel_str]["ColorTable"][
-                            0:-1
-                        ]
-                    color_key = "color_table"
-                channel_information[color_key] = [
-                    float(val) for val in color_info.tobytes().split()
+        meta_data_dict["unit"] = (
+            f[dataset_info_dirname]["Image"].attrs["Unit"].tobytes().decode("UTF-8")
+        )
+        resolution_sizes = []
+        storage_info = []
+        for i in range(len(f[dataset_dirname])):
+            resolution_name = f"ResolutionLevel {i}"
+            resolution_sizes.append(
+                [
+                    int(
+                        f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"]
+                        .attrs["ImageSizeX"]
+                        .tobytes()
+                    ),
+                    int(
+                        f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"]
+                        .attrs["ImageSizeY"]
+                        .tobytes()
+                    ),
+                    int(
+                        f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"]
+                        .attrs["ImageSizeZ"]
+                        .tobytes()
+                    ),
                 ]
-                channel_information["range"] = [
-                    float(val)
-                    for val in f[dataset_info_dirname][channel_str]
-                    .attrs["ColorRange"]
-                    .tobytes()
-                    .split()
+            )
+            storage_info.append(
+                [
+                    f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"][
+                        "Data"
+                    ].chunks,
+                    f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"][
+                        "Data"
+                    ].compression,
+                    f[dataset_dirname][resolution_name]["TimePoint 0"]["Channel 0"][
+                        "Data"
+                    ].compression_opts,
                 ]
-                channel_information["alpha"] = float(
-                    f[dataset_info_dirname][channel_str].attrs["ColorOpacity"].tobytes()
-                )
-                try:  # Some images have a gamma value, some don't
-                    channel_information["gamma"] = float(
-                        f[dataset_info_dirname][channel_str]
-                        .attrs["GammaCorrection"]
-                        .tobytes()
-                    )
-                except Exception:
-                    pass
-                channels_information.append((i, channel_information))
-            meta_data_dict["channels_information"] = channels_information
+            )
+
+        meta_data_dict["sizes"] = resolution_sizes
+        meta_data_dict["storage_settings"] = storage_info
+
+        # Coordinates of the corners of the imaris volume's bounding box
+        min_x = float(f[dataset_info_dirname]["Image"].attrs["ExtMin0"].tobytes())
+        max_x = float(f[dataset_info_dirname]["Image"].attrs["ExtMax0"].tobytes())
+        min_y = float(f[dataset_info_dirname]["Image"].attrs["ExtMin1"].tobytes())
+        max_y = float(f[dataset_info_dirname]["Image"].attrs["ExtMax1"].tobytes())
+        min_z = float(f[dataset_info_dirname]["Image"].attrs["ExtMin2"].tobytes())
+        max_z = float(f[dataset_info_dirname]["Image"].attrs["ExtMax2"].tobytes())
+        x_size = max_x - min_x
+        y_size = max_y - min_y
+        z_size = max_z - min_z
+        meta_data_dict["spacings"] = [
+            [x_size / sz[0], y_size / sz[1], z_size / sz[2]]
+            for sz in meta_data_dict["sizes"]
+        ]
+
+        # SimpleITK image origin is 0.5*(pixel spacing) from the corner of the volume.
+        meta_data_dict["origin"] = [
+            m_val + 0.5 * spc
+            for m_val, spc in zip([min_x, min_y, min_z], meta_data_dict["spacings"][0])
+        ]
+
+        # Get the number of channels from a group that is guarenteed to exist
+        num_channels = len(f[dataset_dirname]["ResolutionLevel 0"]["TimePoint 0"])
+
+        # Get the pixel type
+        meta_data_dict["sitk_pixel_type"] = sitk.GetImageFromArray(
+            f[dataset_dirname]["ResolutionLevel 0"]["TimePoint 0"]["Channel 0"]["Data"][
+                0:1, 0:1, 0:1
+            ]
+        ).GetPixelID()
+
+        # Get the per-channel metadata.
+        meta_data_dict["channels_information"] = _read_channels_information(
+            f, dataset_info_dirname, num_channels
+        )
     return meta_data_dict
 
 
+def _read_channels_information(f, dataset_info_dirname, num_channels):
+    """
+    Read the per-channel meta-data from an Imaris file that is already open. See
+    read_metadata for the contents of the returned list.
+    """
+    channels_information = []
+    for i in range(num_channels):
+        channel_information = {}
+        channel_str = f"Channel {i}"
+        channel_information["name"] = (
+            f[dataset_info_dirname][channel_str].attrs["Name"].tobytes().decode("UTF-8")
+        )
+        if channel_information["name"] == "\x00":  # null byte
+            channel_information["name"] = ""
+        channel_information["description"] = (
+            f[dataset_info_dirname][channel_str]
+            .attrs["Description"]
+            .tobytes()
+            .decode("UTF-8")
+        )
+        if channel_information["description"] == "\x00":  # null byte
+            channel_information["description"] = ""
+        color_mode = (
+            f[dataset_info_dirname][channel_str]
+            .attrs["ColorMode"]
+            .tobytes()
+            .decode("UTF-8")
+        )
+        # color is a list of float values in [0.0, 1.0] in r,g,b order.
+        # color table is just a longer list of colors in r,g,b order.
+        if color_mode == "BaseColor":
+            color_info = f[dataset_info_dirname][channel_str].attrs["Color"]
+            color_key = "color"
+        elif color_mode == "TableColor":
+            # The actual color table is stored either as a dataset or as an attribute
+            if "ColorTable" in f[dataset_info_dirname][channel_str].attrs:
+                color_info = f[dataset_info_dirname][channel_str].attrs["ColorTable"]
+            else:
+                color_info = f[dataset_info_dirname][channel_str]["ColorTable"][0:-1]
+            color_key = "color_table"
+        channel_information[color_key] = [
+            float(val) for val in color_info.tobytes().split()
+        ]
+        channel_information["range"] = [
+            float(val)
+            for val in f[dataset_info_dirname][channel_str]
+            .attrs["ColorRange"]
+            .tobytes()
+            .split()
+        ]
+        channel_information["alpha"] = float(
+            f[dataset_info_dirname][channel_str].attrs["ColorOpacity"].tobytes()
+        )
+        try:  # Some images have a gamma value, some don't
+            channel_information["gamma"] = float(
+                f[dataset_info_dirname][channel_str].attrs["GammaCorrection"].tobytes()
+            )
+        except Exception:
+            pass
+        channels_information.append((i, channel_information))
+    return channels_information
+
+
 def _ims_set_nullterm_str_attribute(hdf_object, attribute_name, attribute_value):
     """
     Set the value of an attribute attached to the given object. If the attribute
@@ -656,7 +707,70 @@ def read(
     image (SimpleITK.Image): Either a 3D or 4D SimpleITK image, depending on the vector_pixels
                              parameter.
     """
-    meta_data_dict = read_metadata(file_name)
+    with open_reader(file_name) as reader:
+        return read_from(
+            reader,
+            time_index=time_index,
+            resolution_index=resolution_index,
+            channel_index=channel_index,
+            sub_ranges=sub_ranges,
+            vector_pixels=vector_pixels,
+            convert_to_mm=convert_to_mm,
+        )
+
+
+ImarisReader = collections.namedtuple("ImarisReader", ["file", "meta_data"])
+"""An open Imaris file and its meta-data, as returned by read_metadata."""
+
+
+@contextlib.contextmanager
+def open_reader(file_name):
+    """
+    Open an Imaris file for multiple reads. The file is opened and its meta-data
+    is read once, subsequent calls to read_from reuse them and the hdf5 chunk cache.
+    Use as a context manager, the file is closed on exit:
+
+    with open_reader(file_name) as reader:
+        image = read_from(reader, channel_index=0)
+
+    Parameters
+    ----------
+    file_name: Read from this imaris image.
+
+    Returns
+    -------
+    reader (ImarisReader): Reader object to pass to read_from, valid only inside the with block.
+    """
+    with h5py.File(
+        file_name, "r", rdcc_nbytes=30 * 1048576
+    ) as f:  # open file with 30Mb chunk cache
+        yield ImarisReader(f, _read_metadata(f))
+
+
+def read_from(
+    reader,
+    time_index=0,
+    resolution_index=0,
+    channel_index=None,
+    sub_ranges=None,
+    vector_pixels=False,
+    convert_to_mm=False,
+):
+    """
+    Read all or part of an image into a SimpleITK image, using an Imaris file
+    opened with open_reader. All indexing is zero based.
+
+    Parameters
+    ----------
+    reader (ImarisReader): Read from this open imaris image.
+    time_index, resolution_index, channel_index, sub_ranges, vector_pixels, convert_to_mm: See read.
+
+    Returns
+    -------
+    image (SimpleITK.Image): Either a 3D or 4D SimpleITK image, depending on the vector_pixels
+                             parameter.
+    """
+    meta_data_dict = reader.meta_data
     num_channels = len(meta_data_dict["channels_information"])
 
     # Validate the input.
@@ -707,25 +821,23 @@ def read(
             v * unit2mm_conversion[meta_data_dict["unit"]] for v in image_spacing
         ]
 
-    with h5py.File(
-        file_name, "r", rdcc_nbytes=30 * 1048576
-    ) as f:  # open file with 30Mb chunk cache
-        dataset_dirname = f.attrs["DataSetDirectoryName"].tobytes().decode("UTF-8")
-        sitk_imaris_channels_list = []
-        for ci in channel_index:
-            sitk_imaris_channels_list.append(
-                sitk.GetImageFromArray(
-                    f[dataset_dirname][f"ResolutionLevel {resolution_index}"][
-                        f"TimePoint {time_index}"
-                    ][f"Channel {ci}"]["Data"][
-                        read_ranges[2].start : read_ranges[2].stop,  # noqa: E203
-                        read_ranges[1].start : read_ranges[1].stop,  # noqa: E203
-                        read_ranges[0].start : read_ranges[0].stop,  # noqa: E203
-                    ]
-                )
+    f = reader.file
+    dataset_dirname = f.attrs["DataSetDirectoryName"].tobytes().decode("UTF-8")
+    sitk_imaris_channels_list = []
+    for ci in channel_index:
+        sitk_imaris_channels_list.append(
+            sitk.GetImageFromArray(
+                f[dataset_dirname][f"ResolutionLevel {resolution_index}"][
+                    f"TimePoint {time_index}"
+                ][f"Channel {ci}"]["Data"][
+                    read_ranges[2].start : read_ranges[2].stop,  # noqa: E203
+                    read_ranges[1].start : read_ranges[1].stop,  # noqa: E203
+                    read_ranges[0].start : read_ranges[0].stop,  # noqa: E203
+                ]
             )
-            sitk_imaris_channels_list[-1].SetOrigin(image_origin)
-            sitk_imaris_channels_list[-1].SetSpacing(image_spacing)
+        )
+        sitk_imaris_channels_list[-1].SetOrigin(image_origin)
+        sitk_imaris_channels_list[-1].SetSpacing(image_spacing)
     if len(sitk_imaris_channels_list) > 1:
         if vector_pixels:
             image = sitk.Compose(sitk_imaris_channels_list)
@@ -0,0 +1,93 @@
+# =========================================================================
+#
+#  Copyright Ziv Yaniv
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+# =========================================================================
+
+import re
+import pytest
+import SimpleITK as sitk
+import sitk_ims_file_io as sio
+import numpy as np
+from XTChannelArithmetic import ArithmeticCalculator
+
+
+class TestArithmeticCalculator:
+    def setup_method(self):
+        rng = np.random.default_rng(0)
+        self.arrays = [
+            rng.integers(0, 40, size=(4, 30, 40)).astype(np.uint8) for _ in range(2)
+        ]
+
+    def write_image(self, file_name):
+        image = sitk.Compose([sitk.GetImageFromArray(arr) for arr in self.arrays])
+        image.SetMetaData(
+            sio.channels_metadata_key,
+            sio.channels_information_list2xmlstr(
+                [
+                    (
+                        i,
+                        {
+                            "name": f"ch{i}",
+                            "description": "",
+                            "color": [1.0, 1.0, 1.0],
+                            "alpha": 1.0,
+                            "range": [0.0, 255.0],
+                        },
+                    )
+                    for i in range(len(self.arrays))
+                ]
+            ),
+        )
+        sio.write(image, file_name)
+
+    def run_calculator(self, file_name, expression, slice_by_slice):
+        calculator = ArithmeticCalculator(re.compile(r"\[(0|[1-9]\d*)\]"))
+        calculator.reset()
+        calculator.input_file_name = file_name
+        calculator.arithmetic_expression = expression
+        calculator.new_channel_color = [1.0, 1.0, 1.0]
+        calculator.new_channel_alpha = 1.0
+        calculator.new_channel_name = "result"
+        calculator.slice_by_slice = slice_by_slice
+        errors = []
+        calculator.signals.processing_error.connect(errors.append)
+        calculator.run()
+        assert errors == []
+
+    # The channels are referenced inside nested scopes (generator expression,
+    # lambda) which don't see the local variables of the evaluated expression.
+    @pytest.mark.parametrize("slice_by_slice", [False, True])
+    def test_nested_scope_channels(self, slice_by_slice, tmp_path):
+        file_name = str(tmp_path / "image.ims")
+        self.write_image(file_name)
+        self.run_calculator(file_name, "sum(([0]*k+[1])for(k)in(1,2))", slice_by_slice)
+        assert sio.read_number_of_channels(file_name) == 3
+        assert np.array_equal(
+            sitk.GetArrayViewFromImage(sio.read(file_name, channel_index=2)),
+            3 * self.arrays[0] + 2 * self.arrays[1],
+        )
+
+    @pytest.mark.parametrize("slice_by_slice", [False, True])
+    def test_nested_scope_all_channels(self, slice_by_slice, tmp_path):
+        file_name = str(tmp_path / "image.ims")
+        self.write_image(file_name)
+        self.run_calculator(file_name, "(lambda:[i]+1)()", slice_by_slice)
+        assert sio.read_number_of_channels(file_name) == 4
+        for i, arr in enumerate(self.arrays):
+            assert np.array_equal(
+                sitk.GetArrayViewFromImage(sio.read(file_name, channel_index=2 + i)),
+                arr + 1,
+            )
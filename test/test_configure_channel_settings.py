@@ -0,0 +1,118 @@
+# =========================================================================
+#
+#  Copyright Ziv Yaniv
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+# =========================================================================
+
+import re
+import pytest
+import pandas as pd
+from XTConfigureChannelSettings import parse_color_column, read_csv_settings
+
+
+class TestParseColorColumn:
+    @pytest.mark.parametrize(
+        "color_column, result",
+        [
+            (["255,0,0", "0 51 255"], [[1.0, 0.0, 0.0], [0.0, 0.2, 1.0]]),
+            (["255,0,0", "1-2 3 4"], [[1.0, 0.0, 0.0], []]),
+            (["255,0,0", "256 0 0"], [[1.0, 0.0, 0.0], []]),
+            (["255,0,0", "1 2"], [[1.0, 0.0, 0.0], []]),
+            (["255,0,0", "1 2 3 4"], [[1.0, 0.0, 0.0], []]),
+        ],
+    )
+    def test_triplets(self, color_column, result):
+        assert parse_color_column(pd.Series(color_column), "") == result
+
+    def test_mixed_and_malformed(self, tmp_path):
+        (tmp_path / "valid.pal").write_text("0 0 0\n255 51 0\n")
+        (tmp_path / "incomplete.pal").write_text("0 0 0\n255 51\n")
+        (tmp_path / "out_of_range.pal").write_text("0 0 0\n256 51 0\n")
+        color_column = pd.Series(
+            [
+                "valid.pal",
+                "0,51,255",
+                "incomplete.pal",
+                "out_of_range.pal",
+                "missing.pal",
+                "1 2 x",
+                float("nan"),
+                "valid.pal",
+            ]
+        )
+        assert parse_color_column(color_column, str(tmp_path)) == [
+            [0.0, 0.0, 0.0, 1.0, 0.2, 0.0],
+            [0.0, 0.2, 1.0],
+            [],
+            [],
+            [],
+            [],
+            [],
+            [0.0, 0.0, 0.0, 1.0, 0.2, 0.0],
+        ]
+
+
+class TestReadCSVSettings:
+    def write_csv(self, tmp_path, contents):
+        file_name = tmp_path / "settings.csv"
+        file_name.write_text(contents)
+        return str(file_name)
+
+    def test_read(self, tmp_path):
+        (tmp_path / "table.pal").write_text("0 0 0\n255 51 0\n")
+        file_name = self.write_csv(
+            tmp_path,
+            "name,description,color,alpha,range,gamma,notes\n"
+            + 'NA,first,"255,0,0",1.0,"0,255",1.0,\n'
+            + "CD3,second,table.pal,0.5,10 200,2.0,some notes\n",
+        )
+        assert read_csv_settings(file_name) == [
+            (
+                0,
+                {
+                    "name": "NA",
+                    "description": "first",
+                    "color": [1.0, 0.0, 0.0],
+                    "alpha": 1.0,
+                    "range": [0.0, 255.0],
+                    "gamma": 1.0,
+                },
+            ),
+            (
+                1,
+                {
+                    "name": "CD3",
+                    "description": "second",
+                    "color_table": [0.0, 0.0, 0.0, 1.0, 0.2, 0.0],
+                    "alpha": 0.5,
+                    "range": [10.0, 200.0],
+                    "gamma": 2.0,
+                },
+            ),
+        ]
+
+    @pytest.mark.parametrize(
+        "contents, message",
+        [
+            ("name,alpha\nch1,1.0\nch2,\n", "Missing values in row(s): 1"),
+            ('name,color\nch1,"255,0,0"\nch2,missing.pal\n', "row(s): 1"),
+            ('name,color\nch1,"255,0"\nch2,"0,0,0"\n', "row(s): 0"),
+            ('name,range\nch1,"0,255"\nch2,"0,abc"\n', "abc"),
+            ("notes\nsome notes\n", "does not contain any column"),
+        ],
+    )
+    def test_read_errors(self, tmp_path, contents, message):
+        with pytest.raises(Exception, match=re.escape(message)):
+            read_csv_settings(self.write_csv(tmp_path, contents))
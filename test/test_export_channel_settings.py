@@ -0,0 +1,82 @@
+# =========================================================================
+#
+#  Copyright Ziv Yaniv
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+# =========================================================================
+
+import pytest
+import SimpleITK as sitk
+import sitk_ims_file_io as sio
+from XTExportChannelSettings import export_channel_settings
+from XTConfigureChannelSettings import read_csv_settings
+
+
+class TestExportChannelSettings:
+    def write_image(self, file_name, channels_information):
+        image = sitk.Compose(
+            [sitk.Image([4, 3, 2], sitk.sitkUInt8)] * len(channels_information)
+        )
+        image.SetMetaData(
+            sio.channels_metadata_key,
+            sio.channels_information_list2xmlstr(channels_information),
+        )
+        sio.write(image, file_name)
+
+    @pytest.mark.parametrize(
+        "gammas, exported_gammas",
+        [
+            ([None, None, None], [None, None, None]),
+            ([2.0, None, 0.5], [2.0, 1.0, 0.5]),
+            ([2.0, 1.5, 0.5], [2.0, 1.5, 0.5]),
+        ],
+    )
+    def test_round_trip(self, gammas, exported_gammas, tmp_path):
+        channels_information = []
+        for i, gamma in enumerate(gammas):
+            channel_information = {
+                "name": f"ch{i}",
+                "description": f"channel {i}",
+                "alpha": 1.0,
+                "range": [0.0, 200.0 + i],
+            }
+            if i == 1:
+                channel_information["color_table"] = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0]
+            else:
+                channel_information["color"] = [1.0, 0.2, 0.0]
+            if gamma is not None:
+                channel_information["gamma"] = gamma
+            channels_information.append((i, channel_information))
+        image_file_name = str(tmp_path / "image.ims")
+        self.write_image(image_file_name, channels_information)
+
+        csv_file_name = str(tmp_path / "channel_settings.csv")
+        export_channel_settings(image_file_name, csv_file_name)
+        channel_settings = read_csv_settings(csv_file_name)
+
+        assert len(channel_settings) == len(channels_information)
+        for (i, exported), (j, original), gamma in zip(
+            channel_settings, channels_information, exported_gammas
+        ):
+            assert i == j
+            expected = dict(original)
+            expected.pop("gamma", None)
+            if gamma is not None:
+                expected["gamma"] = gamma
+            assert exported.keys() == expected.keys()
+            for key, value in expected.items():
+                if isinstance(value, str):
+                    assert exported[key] == value
+                else:
+                    assert exported[key] == pytest.approx(value)
@@ -0,0 +1,124 @@
+# =========================================================================
+#
+#  Copyright Ziv Yaniv
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+# =========================================================================
+
+import pytest
+import SimpleITK as sitk
+import numpy as np
+from XTRegisterSameChannel import correlation_matrix, align_to_resample_grid
+
+
+class TestCorrelationMatrix:
+    def setup_method(self):
+        rng = np.random.default_rng(42)
+        base = rng.integers(0, 256, size=(6, 40, 30))
+        # Images with varying degrees of correlation to the base image.
+        self.arrays = [
+            base.astype(np.uint8),
+            np.clip(base + rng.integers(-20, 20, size=base.shape), 0, 255).astype(
+                np.uint8
+            ),
+            (255 - base).astype(np.uint8),
+            rng.integers(0, 256, size=base.shape).astype(np.uint8),
+        ]
+
+    @pytest.mark.parametrize(
+        "slices, block_bytes",
+        [
+            (slice(None), 32 * 1048576),
+            (slice(None), 1000),
+            (slice(0, 1), 32 * 1048576),
+            (slice(0, 1), 100),
+        ],
+    )
+    def test_blocked(self, slices, block_bytes):
+        arrays = [arr[slices] for arr in self.arrays]
+        images = [sitk.GetImageFromArray(arr) for arr in arrays]
+        assert np.allclose(
+            correlation_matrix(images, block_bytes=block_bytes),
+            np.corrcoef([arr.reshape(-1) for arr in arrays]),
+            atol=1e-6,
+        )
+
+    @pytest.mark.parametrize("max_samples", [10, 1000])
+    def test_sampled(self, max_samples):
+        images = [sitk.GetImageFromArray(arr) for arr in self.arrays]
+        num_pixels = self.arrays[0].size
+        sample_indexes = np.sort(
+            np.random.default_rng(0).integers(0, num_pixels, max_samples)
+        )
+        assert np.allclose(
+            correlation_matrix(images, max_samples=max_samples),
+            np.clip(
+                np.corrcoef([arr.reshape(-1)[sample_indexes] for arr in self.arrays]),
+                -1,
+                1,
+            ),
+        )
+
+    def test_max_samples_not_reached(self):
+        images = [sitk.GetImageFromArray(arr) for arr in self.arrays]
+        assert np.allclose(
+            correlation_matrix(images, max_samples=self.arrays[0].size),
+            np.corrcoef([arr.reshape(-1) for arr in self.arrays]),
+            atol=1e-6,
+        )
+
+
+class TestAlignToResampleGrid:
+    @pytest.mark.parametrize("pixel_type", [sitk.sitkUInt8, sitk.sitkFloat32])
+    @pytest.mark.parametrize(
+        "image_size, resample_size",
+        [
+            ([40, 30, 6], [40, 30, 6]),
+            ([40, 30, 6], [32, 25, 4]),
+            ([40, 30, 6], [48, 36, 9]),
+            ([40, 30, 6], [48, 25, 6]),
+            ([40, 30, 1], [35, 33, 1]),
+        ],
+    )
+    def test_equal_spacing(self, pixel_type, image_size, resample_size):
+        rng = np.random.default_rng(0)
+        image = sitk.Cast(
+            sitk.GetImageFromArray(rng.integers(1, 256, size=image_size[::-1])),
+            pixel_type,
+        )
+        spacing = [0.5, 0.4, 2.0]
+        image.SetSpacing(spacing)
+        image.SetOrigin([10.0, -3.0, 7.0])
+        resample_origin = [1.0, 2.0, 3.0]
+        # The resample grid points coincide with the image's pixels, so nearest
+        # neighbor interpolation gives the exact pixel values (linear interpolation
+        # may truncate integer pixel values due to floating point errors).
+        expected = sitk.Resample(
+            image,
+            resample_size,
+            sitk.TranslationTransform(
+                3, [io - ro for io, ro in zip(image.GetOrigin(), resample_origin)]
+            ),
+            sitk.sitkNearestNeighbor,
+            resample_origin,
+            spacing,
+        )
+        aligned = align_to_resample_grid(image, resample_size, resample_origin, spacing)
+        assert aligned.GetPixelID() == expected.GetPixelID()
+        assert aligned.GetSize() == expected.GetSize()
+        assert np.allclose(aligned.GetOrigin(), expected.GetOrigin())
+        assert np.allclose(aligned.GetSpacing(), expected.GetSpacing())
+        assert np.array_equal(
+            sitk.GetArrayViewFromImage(aligned), sitk.GetArrayViewFromImage(expected)
+        )
@@ -26,6 +26,15 @@ import SimpleITK as sitk
 import sitk_ims_file_io as sio
 import numpy as np
 
+# All the test images, used by tests that apply to every image.
+ALL_FILE_NAMES = [
+    "image_2D_six_channels_one_resolution_one_timepoint.ims",
+    "image_2D_three_channels_one_resolution_four_timepoints.ims",
+    "image_3D_six_channels_four_resolutions_one_timepoint.ims",
+    "image_3D_three_channels_two_resolutions_four_timepoints.ims",
+    "image_3D_four_channels_two_resolutions_one_timepoint_uint16.ims",
+]
+
 
 class TestIO:
     def setup_method(self):
@@ -665,16 +674,7 @@ class TestIO:
                 print(e)
                 assert result_md5 is None
 
-    @pytest.mark.parametrize(
-        "file_name",
-        [
-            "image_2D_six_channels_one_resolution_one_timepoint.ims",
-            "image_2D_three_channels_one_resolution_four_timepoints.ims",
-            "image_3D_six_channels_four_resolutions_one_timepoint.ims",
-            "image_3D_three_channels_two_resolutions_four_timepoints.ims",
-            "image_3D_four_channels_two_resolutions_one_timepoint_uint16.ims",
-        ],
-    )
+    @pytest.mark.parametrize("file_name", ALL_FILE_NAMES)
     def test_write(self, file_name, tmp_path):
         # Default read (resolution=0, time=0, all channels)
         sitk_image = sio.read(self.data_path / file_name)
@@ -683,3 +683,36 @@ class TestIO:
         sio.write(sitk_image, tmp_path / file_name)
         sitk_image = sio.read(tmp_path / file_name)
         assert original_md5 == self.image_md5(sitk_image)
+
+    @pytest.mark.parametrize("file_name", ALL_FILE_NAMES)
+    def test_read_from(self, file_name):
+        """
+        Read every time point and channel using a single open reader and compare
+        to the results of the standalone read.
+        """
+        metadata = sio.read_metadata(self.data_path / file_name)
+        with sio.open_reader(self.data_path / file_name) as reader:
+            for ti in range(len(metadata["times"])):
+                for ci in range(len(metadata["channels_information"])):
+                    assert self.image_md5(
+                        sio.read_from(reader, time_index=ti, channel_index=ci)
+                    ) == self.image_md5(
+                        sio.read(
+                            self.data_path / file_name, time_index=ti, channel_index=ci
+                        )
+                    )
+
+    @pytest.mark.parametrize("file_name", ALL_FILE_NAMES)
+    def test_read_number_of_channels(self, file_name):
+        metadata = sio.read_metadata(self.data_path / file_name)
+        assert sio.read_number_of_channels(self.data_path / file_name) == len(
+            metadata["channels_information"]
+        )
+
+    @pytest.mark.parametrize("file_name", ALL_FILE_NAMES)
+    def test_read_channels_information(self, file_name):
+        metadata = sio.read_metadata(self.data_path / file_name)
+        assert (
+            sio.read_channels_information(self.data_path / file_name)
+            == metadata["channels_information"]
+        )
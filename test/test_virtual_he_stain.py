@@ -0,0 +1,183 @@
+# =========================================================================
+#
+#  Copyright Ziv Yaniv
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+# =========================================================================
+
+import pytest
+import SimpleITK as sitk
+import sitk_ims_file_io as sio
+import numpy as np
+from XTVirtualHEStain import (
+    gareau_virtual_stain,
+    giacomelli_virtual_stain,
+    rescale_slices,
+    stain_uint8_slices,
+    VirtualHEStainer,
+)
+
+
+def sitk_gareau_virtual_stain(h_channel, e_channel):
+    virtual_he = [
+        1.0 - 0.7 * h_channel,
+        1.0 - 0.8 * h_channel - 0.45 * e_channel,
+        1.0 - 0.12 * e_channel,
+    ]
+    return sitk.Compose(
+        [
+            sitk.Clamp(c * 255.0, sitk.sitkUInt8, lowerBound=0, upperBound=255)
+            for c in virtual_he
+        ]
+    )
+
+
+def sitk_giacomelli_virtual_stain(h_channel, e_channel):
+    virtual_he = [
+        (sitk.Exp(-0.125 * e_channel) - 0.0821)
+        * (sitk.Exp(-2.15 * h_channel) - 0.0821)
+        * 1.18679236,
+        (sitk.Exp(-2.5 * e_channel) - 0.0821)
+        * (sitk.Exp(-2.5 * h_channel) - 0.0821)
+        * 1.18679236,
+        (sitk.Exp(-1.36 * e_channel) - 0.0821)
+        * (sitk.Exp(-0.75 * h_channel) - 0.0821)
+        * 1.18679236,
+    ]
+    return sitk.Compose(
+        [
+            sitk.Clamp(c * 255.0, sitk.sitkUInt8, lowerBound=0, upperBound=255)
+            for c in virtual_he
+        ]
+    )
+
+
+def sitk_virtual_stain(h_arr, e_arr, sitk_algorithm):
+    """
+    Slice by slice SimpleITK reference, each slice is rescaled to [0,1] in float32.
+    """
+    virtual_he_slices = []
+    for h_slice, e_slice in zip(h_arr, e_arr):
+        h_channel, e_channel = [
+            sitk.RescaleIntensity(
+                sitk.Cast(sitk.GetImageFromArray(slc), sitk.sitkFloat32), 0.0, 1.0
+            )
+            for slc in [h_slice, e_slice]
+        ]
+        virtual_he_slices.append(
+            sitk.GetArrayFromImage(sitk_algorithm(h_channel, e_channel))
+        )
+    return np.stack(virtual_he_slices)
+
+
+algorithms = [
+    (gareau_virtual_stain, sitk_gareau_virtual_stain),
+    (giacomelli_virtual_stain, sitk_giacomelli_virtual_stain),
+]
+
+
+def random_slices(dtype, shape, seed):
+    rng = np.random.default_rng(seed)
+    if np.issubdtype(dtype, np.integer):
+        return rng.integers(
+            np.iinfo(dtype).max // 8, np.iinfo(dtype).max, shape, endpoint=True
+        ).astype(dtype)
+    return (1000.0 * rng.random(shape) - 100.0).astype(dtype)
+
+
+class TestVirtualHEStain:
+    @pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.float32])
+    @pytest.mark.parametrize("algorithm, sitk_algorithm", algorithms)
+    def test_float_path(self, dtype, algorithm, sitk_algorithm):
+        h_arr = random_slices(dtype, (3, 30, 40), 0)
+        e_arr = random_slices(dtype, (3, 30, 40), 1)
+        virtual_he = algorithm(rescale_slices(h_arr), rescale_slices(e_arr))
+        expected = sitk_virtual_stain(h_arr, e_arr, sitk_algorithm)
+        assert virtual_he.dtype == np.uint8
+        assert virtual_he.shape == expected.shape
+        # Rounding differences between the float32 computations are at most one
+        # gray level.
+        assert (
+            np.abs(virtual_he.astype(int) - expected.astype(int)).max() <= 1
+            and np.mean(virtual_he != expected) < 0.001
+        )
+
+    @pytest.mark.parametrize("algorithm, sitk_algorithm", algorithms)
+    def test_uint8_lookup_table(self, algorithm, sitk_algorithm):
+        h_arr = random_slices(np.uint8, (3, 300, 280), 0)
+        e_arr = random_slices(np.uint8, (3, 300, 280), 1)
+        virtual_he = np.empty(h_arr.shape + (3,), dtype=np.uint8)
+        stain_uint8_slices(h_arr, e_arr, algorithm, virtual_he)
+        assert np.array_equal(
+            virtual_he, algorithm(rescale_slices(h_arr), rescale_slices(e_arr))
+        )
+
+    @pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.float32])
+    def test_constant_slice(self, dtype):
+        arr = random_slices(dtype, (3, 30, 40), 0)
+        arr[1] = arr[1, 0, 0]
+        rescaled = rescale_slices(arr)
+        assert rescaled.dtype == np.float32
+        assert np.all(rescaled[1] == 0)
+        for i in [0, 2]:
+            assert rescaled[i].min() == 0 and rescaled[i].max() == 1
+
+    @pytest.mark.parametrize("algorithm_name", ["Giacomelli 2016", "Gareau 2009"])
+    @pytest.mark.parametrize("slice_size", [(40, 30), (300, 280)])
+    def test_run(self, algorithm_name, slice_size, tmp_path):
+        # Seven slices processed in blocks of three, so the last block is partial.
+        # The larger slices are stained using the lookup table.
+        h_arr = random_slices(np.uint8, (7,) + slice_size[::-1], 0)
+        e_arr = random_slices(np.uint8, (7,) + slice_size[::-1], 1)
+        image = sitk.Compose(
+            [sitk.GetImageFromArray(h_arr), sitk.GetImageFromArray(e_arr)]
+        )
+        image.SetMetaData(
+            sio.channels_metadata_key,
+            sio.channels_information_list2xmlstr(
+                [
+                    (
+                        i,
+                        {
+                            "name": name,
+                            "description": "",
+                            "color": [1.0, 1.0, 1.0],
+                            "alpha": 1.0,
+                            "range": [0.0, 255.0],
+                        },
+                    )
+                    for i, name in enumerate(["H", "E"])
+                ]
+            ),
+        )
+        file_name = str(tmp_path / "image.ims")
+        sio.write(image, file_name)
+
+        stainer = VirtualHEStainer()
+        stainer.input_file_names = [file_name]
+        stainer.h_str = "H"
+        stainer.e_str = "E"
+        stainer.algorithm_name = algorithm_name
+        stainer.total_pixels = h_arr.size
+        stainer.block_bytes = 3 * 4 * slice_size[0] * slice_size[1]
+        stainer.run()
+
+        algorithm = stainer.algorithms[algorithm_name]
+        expected = algorithm(rescale_slices(h_arr), rescale_slices(e_arr))
+        assert sio.read_number_of_channels(file_name) == 5
+        for i in range(3):
+            assert np.array_equal(
+                sitk.GetArrayViewFromImage(sio.read(file_name, channel_index=2 + i)),
+                expected[..., i],
+            )